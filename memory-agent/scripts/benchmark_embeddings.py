@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark embedding throughput of the torch and ONNX backends
+"""
+
+import argparse
+import time
+
+from memory_agent.embeddings import BACKENDS, EmbeddingEngine
+
+SENTENCES = [
+    "Project kickoff meeting. Timeline: 3 months, budget: $50k",
+    "Learned about vector databases. Lance seems promising.",
+    "Dentist appointment scheduled for March 15 at 2pm",
+    "Python is a great programming language for data work",
+]
+
+
+def throughput(engine: EmbeddingEngine, batch_size: int, n_texts: int) -> float:
+    """Texts per second embedding n_texts in batches of batch_size"""
+    texts = [f"{SENTENCES[i % len(SENTENCES)]} #{i}" for i in range(n_texts)]
+    engine.batch_size = batch_size
+    engine.embed_batch(texts[:batch_size], show_progress=False)  # warm up
+
+    start = time.perf_counter()
+    if batch_size == 1:
+        for text in texts:
+            engine.embed(text)
+    else:
+        engine.embed_batch(texts, show_progress=False)
+    return n_texts / (time.perf_counter() - start)
+
+
+def main():
+    """Print texts/sec for each backend and batch size"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 32, 256])
+    parser.add_argument("--texts", type=int, default=1024, help="Texts per measurement")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'batch':>6} {'texts/sec':>10}")
+    for backend in args.backends:
+        engine = EmbeddingEngine(args.model, backend=backend, cache_size=0)
+        for batch_size in args.batch_sizes:
+            rate = throughput(engine, batch_size, args.texts)
+            print(f"{backend:<8} {batch_size:>6} {rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Benchmark ingest, retrieval, deletion and cold open at 10k-1M memories
+with the hash:// embedder, writing JSON results to diff across commits
+"""
+
+import argparse
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from memory_agent.config import Config, EmbeddingConfig, StorageConfig
+from memory_agent.memory_manager import SEARCH_MODES, MemoryManager
+from memory_agent.sharded_store import SHARD_BY, ShardedVectorStore
+from memory_agent.vector_store import VectorStore
+
+TOPICS = ["travel", "health", "finance", "cooking", "work", "family", "garden", "music"]
+WORDS = (
+    "meeting budget deadline recipe flight hotel doctor invoice guitar tomato "
+    "review launch refund ticket playlist pruning checkup salary concert dinner"
+).split()
+
+# Result keys where higher is better, for --baseline comparisons
+HIGHER_IS_BETTER = {"bulk_per_sec"}
+
+
+def corpus(start: int, stop: int, seed: int = 0):
+    """Memories start..stop-1, identical for a given seed across runs"""
+    for i in range(start, stop):
+        rng = random.Random(seed * 1_000_003 + i)
+        topic = rng.choice(TOPICS)
+        words = " ".join(rng.choices(WORDS, k=rng.randrange(8, 40)))
+        yield {"id": f"mem_{i}", "content": f"{topic} note {i}: {words}", "tags": [topic]}
+
+
+def latency(timings: list) -> dict:
+    """Mean and p50/p95/p99 of per-call timings in milliseconds"""
+    return {
+        "mean_ms": float(np.mean(timings)),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "p99_ms": float(np.percentile(timings, 99)),
+    }
+
+
+def timed(calls) -> list:
+    """Milliseconds taken by each call in an iterable of thunks"""
+    timings = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def open_store(data_dir: str, args: dict):
+    """Open the store a run left behind, loading every shard of a sharded one"""
+    if not args["shard_by"]:
+        return VectorStore(data_dir, index_factory=args["index"])
+    store = ShardedVectorStore(data_dir, index_factory=args["index"])
+    store.count()  # shards open lazily; counting opens them all
+    return store
+
+
+def run(size: int, args: dict) -> dict:
+    """Measure one corpus size in a fresh store"""
+    ops, seed = args["ops"], args["seed"]
+    rng = random.Random(seed)
+    report = {"size": size}
+
+    with tempfile.TemporaryDirectory(dir=args["dir"]) as data_dir:
+        config = Config(
+            embedding=EmbeddingConfig(model_name=args["model"], cache_persist=False),
+            storage=StorageConfig(
+                data_dir=Path(data_dir),
+                index_factory=args["index"],
+                persist_metrics=False,
+                shard_by=args["shard_by"],
+                shards=args["shards"],
+            ),
+        )
+        manager = MemoryManager(config)
+
+        start = time.perf_counter()
+        manager.add_memories(corpus(0, size, seed), batch_size=args["batch_size"])
+        elapsed = time.perf_counter() - start
+        report["bulk_s"] = elapsed
+        report["bulk_per_sec"] = size / elapsed
+
+        added = iter(corpus(size, size + ops, seed))
+        report["add_memory"] = latency(
+            timed(
+                lambda item=item: manager.add_memory(item["content"], tags=item["tags"])
+                for item in added
+            )
+        )
+
+        queries = [f"{rng.choice(TOPICS)} {' '.join(rng.choices(WORDS, k=4))}" for _ in range(ops)]
+        manager.search(queries[0])  # warm up
+        for mode in args["modes"]:
+            report[f"search_{mode}"] = latency(
+                timed(
+                    lambda query=query: manager.search(query, limit=args["k"], mode=mode)
+                    for query in queries
+                )
+            )
+
+        # add_memory assigns its own IDs, so get and delete only touch the bulk corpus
+        ids = [f"mem_{i}" for i in rng.sample(range(size), min(ops, size))]
+        report["get_memory"] = latency(timed(lambda id=id: manager.get_memory(id) for id in ids))
+        report["delete"] = latency(timed(lambda id=id: manager.delete_memory(id) for id in ids))
+
+        report["disk_bytes"] = manager.vector_store.disk_usage()
+        manager.vector_store.close()
+
+        # Cold open as left by the run (replaying the WAL), then from a checkpoint
+        start = time.perf_counter()
+        store = open_store(data_dir, args)
+        report["open_ms"] = (time.perf_counter() - start) * 1000
+        store.checkpoint()
+        store.close()
+        start = time.perf_counter()
+        store = open_store(data_dir, args)
+        report["open_checkpointed_ms"] = (time.perf_counter() - start) * 1000
+        store.close()
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def environment() -> dict:
+    """Versions and commit the results were measured on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "faiss": faiss.__version__,
+    }
+
+
+def flatten(report: dict, prefix: str = "") -> dict:
+    """Numeric results keyed by dotted path"""
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results: list, baseline: dict):
+    """Print each result's change relative to the same size in a baseline run"""
+    previous = {report["size"]: flatten(report) for report in baseline["results"]}
+    commit = baseline["environment"].get("commit")
+    print(f"\nChange vs baseline {commit or ''} (+ is worse)")
+    for report in results:
+        old = previous.get(report["size"])
+        if old is None:
+            continue
+        for key, value in flatten(report).items():
+            if key == "size" or not old.get(key):
+                continue
+            change = (value - old[key]) / old[key]
+            if key in HIGHER_IS_BETTER:
+                change = -change
+            print(
+                f"{report['size']:>9} {key:<30} {old[key]:>12.3f} -> {value:>12.3f} "
+                f"{change:+.1%}"
+            )
+
+
+def main():
+    """Run each corpus size in its own process and write the results as JSON"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[10_000, 100_000], help="e.g. 10000 100000 1000000"
+    )
+    parser.add_argument("--ops", type=int, default=500, help="Calls per single-item measurement")
+    parser.add_argument("--modes", nargs="+", default=["vector"], choices=SEARCH_MODES)
+    parser.add_argument("--index", default="Flat", help="FAISS index factory string")
+    parser.add_argument("--shard-by", default="", choices=("",) + SHARD_BY)
+    parser.add_argument("--shards", type=int, default=8, help="Shards of a hash-sharded store")
+    parser.add_argument(
+        "--model", default="hash://384", help="Embedding model; hash:// costs next to nothing"
+    )
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", type=Path, help="Where to create the temporary stores")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_scale.json"))
+    parser.add_argument("--baseline", type=Path, help="Earlier JSON output to compare against")
+    args = parser.parse_args()
+
+    options = {
+        "ops": args.ops,
+        "modes": args.modes,
+        "index": args.index,
+        "model": args.model,
+        "shard_by": args.shard_by,
+        "shards": args.shards,
+        "batch_size": args.batch_size,
+        "k": args.k,
+        "seed": args.seed,
+        "dir": str(args.dir) if args.dir else None,
+    }
+    results = []
+    print(
+        f"{'size':>9} {'bulk/s':>8} {'add p50':>8} {'search p50':>10} {'search p95':>10} "
+        f"{'get p50':>8} {'delete p50':>10} {'open ms':>8} {'rss MB':>8}"
+    )
+    for size in args.sizes:
+        # A fresh process per size keeps peak RSS and caches independent
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            report = pool.submit(run, size, options).result()
+        results.append(report)
+        search = report[f"search_{args.modes[0]}"]
+        print(
+            f"{size:>9} {report['bulk_per_sec']:>8.0f} {report['add_memory']['p50_ms']:>8.2f} "
+            f"{search['p50_ms']:>10.2f} {search['p95_ms']:>10.2f} "
+            f"{report['get_memory']['p50_ms']:>8.2f} {report['delete']['p50_ms']:>10.2f} "
+            f"{report['open_ms']:>8.0f} {report['peak_rss_mb']:>8.0f}"
+        )
+
+    output = {"environment": environment(), "options": options, "results": results}
+    args.output.write_text(json.dumps(output, indent=2) + "\n")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
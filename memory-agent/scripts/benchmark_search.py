@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark recall and latency of vector, lexical and hybrid search
+on a labelled query set
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from memory_agent.config import Config, EmbeddingConfig, SearchConfig, StorageConfig
+from memory_agent.memory_manager import FUSIONS, SEARCH_MODES, MemoryManager
+
+# Notes found by paraphrase, where embeddings should do best
+NOTES = [
+    ("Dentist appointment scheduled for March 15 at 2pm", "when do I see the dentist"),
+    ("Project kickoff meeting. Timeline: 3 months, budget: $50k", "how much money for the project"),
+    ("Learned about vector databases. Lance seems promising.", "notes on embedding stores"),
+    ("Python is a great programming language for data work", "which language for analytics"),
+    ("Renew the car insurance before it lapses in June", "vehicle policy expiry"),
+    ("Grandma's lasagna needs ricotta, not cottage cheese", "pasta bake recipe cheese"),
+    ("The team agreed to move standups to 9:30", "what time is the daily meeting"),
+    ("Backups are copied to the NAS every night at 1am", "when does the storage copy job run"),
+]
+
+SERVICES = ["payments", "search", "auth", "billing", "ingest", "gateway", "mailer", "reports"]
+EVENTS = ["deploy", "config change", "failover", "certificate rotation", "schema migration"]
+
+
+def synthetic(n_incidents: int, seed: int = 0):
+    """Corpus of notes and incident reports, with queries labelled by memory ID"""
+    rng = random.Random(seed)
+    corpus, queries = [], []
+    for i, (note, query) in enumerate(NOTES):
+        corpus.append({"id": f"note_{i}", "content": note})
+        queries.append({"query": query, "relevant": [f"note_{i}"], "kind": "paraphrase"})
+
+    for i in range(n_incidents):
+        host = f"{rng.choice(SERVICES)}-{i:03d}.prod.example.com"
+        code = f"E{rng.randrange(1000, 9999)}-{i}"
+        content = (
+            f"{rng.choice(SERVICES).capitalize()} errors on {host} after the "
+            f"{rng.choice(EVENTS)}, clients saw {code}"
+        )
+        corpus.append({"id": f"incident_{i}", "content": content})
+        for query in (code, f"what broke on {host}"):
+            queries.append({"query": query, "relevant": [f"incident_{i}"], "kind": "identifier"})
+    return corpus, queries
+
+
+def read_jsonl(path: Path) -> list:
+    """Parse a JSON-lines file"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(manager: MemoryManager, queries: list, mode: str, k: int) -> dict:
+    """Recall@k, MRR and per-query latency of one search mode"""
+    hits, reciprocal_ranks, timings = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = manager.search(query["query"], limit=k, mode=mode)
+        timings.append((time.perf_counter() - start) * 1000)
+
+        ids = [result.memory.id for result in results]
+        ranks = [ids.index(id) + 1 for id in query["relevant"] if id in ids]
+        hits.append(bool(ranks))
+        reciprocal_ranks.append(1 / min(ranks) if ranks else 0.0)
+
+    return {
+        "recall": float(np.mean(hits)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "avg_ms": float(np.mean(timings)),
+        "p95_ms": float(np.percentile(timings, 95)),
+    }
+
+
+def main():
+    """Print recall@k, MRR and latency per search mode, overall and per query kind"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--modes", nargs="+", default=list(SEARCH_MODES), choices=SEARCH_MODES)
+    parser.add_argument("--fusion", default="rrf", choices=FUSIONS)
+    parser.add_argument("--incidents", type=int, default=200, help="Synthetic incident reports")
+    parser.add_argument("--corpus", type=Path, help='JSONL of {"id", "content"} memories')
+    parser.add_argument(
+        "--queries", type=Path, help='JSONL of {"query", "relevant": [ids], "kind"} labels'
+    )
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.corpus and args.queries:
+        corpus, queries = read_jsonl(args.corpus), read_jsonl(args.queries)
+    else:
+        corpus, queries = synthetic(args.incidents)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        config = Config(
+            embedding=EmbeddingConfig(
+                model_name=args.model, backend=args.backend, cache_persist=False
+            ),
+            storage=StorageConfig(data_dir=Path(data_dir)),
+            search=SearchConfig(fusion=args.fusion),
+        )
+        manager = MemoryManager(config)
+        manager.add_memories(corpus)
+        manager.search(queries[0]["query"], mode=args.modes[0])  # warm up
+
+        kinds = sorted({query.get("kind", "all") for query in queries})
+        print(f"{len(corpus)} memories, {len(queries)} queries, k={args.k}")
+        print(f"{'mode':<8} {'queries':<11} {'recall':>7} {'mrr':>6} {'avg ms':>7} {'p95 ms':>7}")
+        for mode in args.modes:
+            groups = [("all", queries)]
+            if len(kinds) > 1:
+                groups += [
+                    (kind, [q for q in queries if q.get("kind", "all") == kind]) for kind in kinds
+                ]
+            for kind, group in groups:
+                report = evaluate(manager, group, mode, args.k)
+                print(
+                    f"{mode:<8} {kind:<11} {report['recall']:>7.3f} {report['mrr']:>6.3f} "
+                    f"{report['avg_ms']:>7.2f} {report['p95_ms']:>7.2f}"
+                )
+        manager.vector_store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Token-budgeted chunking of long memories
+Splits on paragraph and sentence boundaries, with overlap between chunks
+"""
+
+import re
+from typing import Callable, List, Tuple
+
+# Sentence ends: terminal punctuation followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = 200,
+    overlap: int = 40,
+    count_tokens: Callable[[str], int] = lambda s: len(s.split()),
+) -> List[str]:
+    """Split text into chunks of at most max_tokens tokens
+
+    Sentences are packed greedily, preferring to break between paragraphs;
+    each chunk after the first repeats up to overlap tokens of trailing
+    sentences from the one before. Sentences longer than max_tokens are split
+    on words. Text that fits in one chunk is returned unchanged.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    units = [
+        (piece, count_tokens(piece))
+        for sentence in _sentences(text)
+        for piece in _split_long(sentence, max_tokens, count_tokens)
+    ]
+
+    chunks: List[str] = []
+    current: List[Tuple[str, int]] = []
+    used = 0
+    for unit, tokens in units:
+        if current and used + tokens > max_tokens:
+            chunks.append(_join(current))
+            # Carry trailing sentences into the next chunk as overlap
+            carried: List[Tuple[str, int]] = []
+            carried_tokens = 0
+            for previous, previous_tokens in reversed(current):
+                if carried_tokens + previous_tokens > overlap:
+                    break
+                carried.insert(0, (previous, previous_tokens))
+                carried_tokens += previous_tokens
+            current, used = carried, carried_tokens
+            # Overlap never crowds out the new sentence itself
+            while current and used + tokens > max_tokens:
+                used -= current.pop(0)[1]
+        current.append((unit, tokens))
+        used += tokens
+    if current:
+        chunks.append(_join(current))
+    return chunks
+
+
+def _sentences(text: str) -> List[str]:
+    """Sentences of text, with paragraph breaks kept as a leading blank line"""
+    sentences = []
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        for i, sentence in enumerate(_SENTENCE_END.split(paragraph.strip())):
+            if sentence:
+                sentences.append(("\n\n" if i == 0 and sentences else "") + sentence)
+    return sentences
+
+
+def _split_long(sentence: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Split a sentence on words into pieces of at most max_tokens"""
+    if count_tokens(sentence) <= max_tokens:
+        return [sentence]
+
+    # Word token counts are summed rather than recounting the growing piece
+    pieces, words, used = [], [], 0
+    for word in sentence.split(" "):
+        tokens = count_tokens(word)
+        if words and used + tokens > max_tokens:
+            pieces.append(" ".join(words))
+            words, used = [], 0
+        words.append(word)
+        used += tokens
+    if words:
+        pieces.append(" ".join(words))
+    return pieces
+
+
+def _join(units: List[Tuple[str, int]]) -> str:
+    """Join sentences back into text, keeping paragraph breaks inside a chunk"""
+    text = ""
+    for unit, _ in units:
+        if not text:
+            text = unit.lstrip("\n")
+        elif unit.startswith("\n"):
+            text += unit
+        else:
+            text += " " + unit
+    return text
@@ -1,13 +1,27 @@
 """
 CLI interface for Memory Agent using Typer
+Heavy modules (torch, sentence-transformers, FAISS) are imported only by
+commands that build a MemoryManager, keeping --help and daemon-backed
+commands fast
 """
 
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List
+
 import typer
 from rich.console import Console
+from rich.live import Live
 from rich.panel import Panel
 from rich.table import Table
 
-from .memory_manager import MemoryManager
+from . import daemon
+from .config import Config
+
+if TYPE_CHECKING:
+    from .memory_manager import MemoryManager
 
 app = typer.Typer(
     name="memory",
@@ -21,10 +35,14 @@ console = Console()
 _manager = None
 
 
-def get_manager() -> MemoryManager:
-    """Get or create memory manager"""
+def get_manager() -> "MemoryManager":
+    """Get or create memory manager, forwarding to the daemon when one is running"""
     global _manager
     if _manager is None:
+        _manager = daemon.connect(daemon.socket_path(Config.load()))
+    if _manager is None:
+        from .memory_manager import MemoryManager
+
         try:
             _manager = MemoryManager()
         except Exception as e:
@@ -50,7 +68,7 @@ def add(
     manager = get_manager()
 
     with console.status("[bold cyan]Adding memory..."):
-        memory = manager.add_memory(text, tags=list(tag))
+        memory = manager.add_memory(text, tags=tag)
 
     console.print(f"[green]✓[/green] Memory saved (id: [cyan]{memory.id}[/cyan])")
     console.print(f"Content: {text[:100]}{'...' if len(text) > 100 else ''}")
@@ -58,18 +76,70 @@ def add(
         console.print(f"Tags: {', '.join(tag)}")
 
 
+@app.command("import")
+def import_(
+    paths: list[Path] = typer.Argument(..., help="JSONL or Markdown files, or directories"),
+    tag: list[str] = typer.Option([], "--tag", "-t", help="Tags added to every memory"),
+    batch_size: int = typer.Option(256, "--batch-size", "-b", help="Memories per write"),
+):
+    """Bulk import memories from JSONL or Markdown files"""
+    manager = get_manager()
+
+    with console.status("[bold cyan]Importing memories..."):
+        count = manager.add_memories(_iter_import_records(paths, tag), batch_size=batch_size)
+
+    console.print(f"[green]✓[/green] Imported {count} memories")
+
+
+def _iter_import_records(paths: List[Path], tags: List[str]) -> Iterator[dict]:
+    """Stream memory records from JSONL lines and whole Markdown files"""
+    for path in paths:
+        if path.is_dir():
+            files = sorted(p for p in path.rglob("*") if p.suffix in (".jsonl", ".md"))
+        else:
+            files = [path]
+
+        for file in files:
+            if file.suffix == ".jsonl":
+                with open(file) as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            record["tags"] = (record.get("tags") or []) + tags
+                            yield record
+            else:
+                content = file.read_text()
+                if content.strip():
+                    yield {"content": content, "tags": tags, "metadata": {"source": str(file)}}
+
+
 @app.command()
 def search(
     query: str = typer.Argument(..., help="Search query"),
     limit: int = typer.Option(5, "--limit", "-n", help="Number of results"),
+    min_score: float = typer.Option(None, "--min-score", "-s", help="Minimum similarity score"),
+    tag: list[str] = typer.Option([], "--tag", "-t", help="Only memories with this tag"),
+    since: datetime = typer.Option(None, "--since", help="Only memories created on/after this"),
+    until: datetime = typer.Option(None, "--until", help="Only memories created before this"),
+    mode: str = typer.Option(
+        None, "--mode", "-m", help="vector, lexical (BM25) or hybrid; default from config"
+    ),
 ):
     """Search memories semantically"""
     manager = get_manager()
+    mode = mode or Config.load().search.mode
 
     console.print(f"Searching for: [cyan]{query}[/cyan]\n")
 
+    filters = {"tags": tag, "since": since, "until": until}
     with console.status("[bold cyan]Searching..."):
-        results = manager.search(query, limit=limit)
+        try:
+            results = manager.search(
+                query, limit=limit, filters=filters, min_score=min_score, mode=mode
+            )
+        except ValueError as e:
+            console.print(f"[red]{e}[/red]")
+            raise typer.Exit(1)
 
     if not results:
         console.print("[yellow]No memories found[/yellow]")
@@ -78,7 +148,11 @@ def search(
     console.print(f"Found {len(results)} result(s):\n")
 
     for i, result in enumerate(results, 1):
-        score_percent = int(result.score * 100)
+        # Only vector similarities read as percentages
+        if mode == "vector":
+            score = f"similarity: {int(result.score * 100)}%"
+        else:
+            score = f"score: {result.score:.3f}"
         content = result.memory.content[:200]
         if len(result.memory.content) > 200:
             content += "..."
@@ -88,7 +162,7 @@ def search(
                 f"{content}\n\n"
                 f"📅 {result.memory.timestamp.strftime('%Y-%m-%d %H:%M')} | "
                 f"🏷️  {', '.join(result.memory.tags) if result.memory.tags else 'no tags'}",
-                title=f"[{i}] {result.memory.id} (similarity: {score_percent}%)",
+                title=f"[{i}] {result.memory.id} ({score})",
                 border_style="cyan",
             )
         )
@@ -116,29 +190,61 @@ def show(memory_id: str = typer.Argument(..., help="Memory ID")):
 
 
 @app.command()
-def ask(question: str = typer.Argument(..., help="Question to ask")):
+def ask(
+    question: str = typer.Argument(..., help="Question to ask"),
+    timings: bool = typer.Option(
+        False, "--timings", help="Show prompt evaluation and generation time"
+    ),
+):
     """Ask a question using LLM"""
     manager = get_manager()
 
     console.print(f"Question: [cyan]{question}[/cyan]\n")
 
+    # The spinner runs until the first piece of the answer arrives
     with console.status("[bold cyan]Thinking..."):
         try:
-            result = manager.ask(question)
+            sources, pieces = manager.ask_stream(question)
+            start = time.perf_counter()
+            answer = next(pieces, "")
+            first = time.perf_counter()
         except Exception as e:
-            console.print(f"[yellow]LLM not configured: {e}[/yellow]")
-            console.print("\nFalling back to search results only...")
-            results = manager.search(question, limit=3)
-            if results:
-                console.print("\nRelevant memories:")
-                for r in results:
-                    console.print(f"• {r.memory.content[:150]}...")
+            _search_fallback(manager, question, f"LLM not configured: {e}")
             raise typer.Exit(0)
 
-    console.print(Panel(result.answer, title="Answer", border_style="green"))
+    # The LLM, or the daemon relaying it, can also fail part way through the answer
+    try:
+        with Live(
+            Panel(answer, title="Answer", border_style="green"),
+            console=console,
+            auto_refresh=False,
+        ) as live:
+            for piece in pieces:
+                answer += piece
+                live.update(Panel(answer, title="Answer", border_style="green"), refresh=True)
+    except Exception as e:
+        _search_fallback(manager, question, f"LLM failed while answering: {e}")
+        raise typer.Exit(0)
+
+    if sources:
+        console.print(f"\n[dim]Sources: {', '.join(sources)}[/dim]")
+    if timings:
+        # Time to the first piece is prompt evaluation; the rest is generation
+        console.print(
+            f"[dim]Prompt eval: {(first - start) * 1000:.0f} ms | "
+            f"Generation: {(time.perf_counter() - first) * 1000:.0f} ms[/dim]"
+        )
+
 
-    if result.sources:
-        console.print(f"\n[dim]Sources: {', '.join(result.sources)}[/dim]")
+def _search_fallback(manager: "MemoryManager", question: str, reason: str):
+    """Report why the LLM gave no answer and show the most relevant memories instead"""
+    console.print(f"[yellow]{reason}[/yellow]")
+    console.print("\nFalling back to search results only...")
+    results = manager.search(question, limit=3)
+    if results:
+        console.print("\nRelevant memories:")
+        for r in results:
+            console.print(f"• {r.memory.content[:150]}...")
 
 
 @app.command()
@@ -147,8 +253,29 @@ def list(
     limit: int = typer.Option(10, "--limit", "-n", help="Number of memories"),
 ):
     """List recent memories"""
-    console.print("[yellow]List command not yet fully implemented[/yellow]")
-    console.print("Use [cyan]search[/cyan] instead for now")
+    manager = get_manager()
+    memories = manager.list_memories(limit=limit, filters={"tags": tag} if tag else None)
+
+    if not memories:
+        console.print("[yellow]No memories found[/yellow]")
+        return
+
+    table = Table(title="Recent Memories")
+    table.add_column("ID", style="cyan")
+    table.add_column("Created", style="dim")
+    table.add_column("Tags", style="green")
+    table.add_column("Content")
+
+    for memory in memories:
+        content = memory.content[:80] + ("..." if len(memory.content) > 80 else "")
+        table.add_row(
+            memory.id,
+            memory.timestamp.strftime("%Y-%m-%d %H:%M"),
+            ", ".join(memory.tags),
+            content,
+        )
+
+    console.print(table)
 
 
 @app.command()
@@ -184,19 +311,134 @@ def stats():
     table.add_column("Value", style="green")
 
     table.add_row("Total Memories", str(stats["total_memories"]))
-    table.add_row("Storage Used", stats.get("storage_used", "N/A"))
-    table.add_row("Average Query Time", stats.get("avg_query_time", "N/A"))
+    table.add_row("Storage Used", _format_bytes(stats["storage_used"]))
+    avg_query_time = stats["avg_query_time"]
+    table.add_row(
+        "Average Query Time", f"{avg_query_time:.1f} ms" if avg_query_time is not None else "N/A"
+    )
+    cache = stats["embedding_cache"]
+    lookups = cache["hits"] + cache["misses"]
+    hit_rate = f" ({cache['hits'] / lookups:.0%})" if lookups else ""
+    table.add_row(
+        "Embedding Cache",
+        f"{cache['hits']} hits / {cache['misses']} misses{hit_rate}, {cache['size']} cached",
+    )
 
     console.print(table)
 
+    if stats["latency"]:
+        latency = Table(title="Latency (ms)")
+        latency.add_column("Stage", style="cyan")
+        for column in ("Count", "Mean", "p50", "p95", "p99"):
+            latency.add_column(column, justify="right")
+        for stage, summary in stats["latency"].items():
+            latency.add_row(
+                stage,
+                str(summary["count"]),
+                *(f"{summary[key]:.2f}" for key in ("mean_ms", "p50_ms", "p95_ms", "p99_ms")),
+            )
+        console.print(latency)
+
+
+def _format_bytes(size: int) -> str:
+    """Human-readable size"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
 
 @app.command()
-def setup():
-    """Initial setup and configuration"""
-    from pathlib import Path
+def reindex(
+    index: str = typer.Option(
+        None, "--index", "-i", help="FAISS index factory string, e.g. HNSW32,Flat or IVF1024,PQ32"
+    ),
+    metric: str = typer.Option(None, "--metric", "-m", help="Similarity metric: l2, ip or cosine"),
+    queries: int = typer.Option(100, "--queries", "-q", help="Queries for the recall report"),
+):
+    """Rebuild the vector index, optionally switching index type or metric"""
+    manager = get_manager()
+
+    with console.status("[bold cyan]Rebuilding index..."):
+        report = manager.reindex(index, metric=metric, eval_queries=queries)
+
+    if index or metric:
+        config = Config.load()
+        config.storage.index_factory = report["index_factory"]
+        config.storage.metric = report["metric"]
+        config.save()
+
+    table = Table(title="Index Report")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green")
+
+    table.add_row("Index", report["index"])
+    table.add_row("Metric", report["metric"])
+    table.add_row("Vectors", str(report["vectors"]))
+    if "recall" in report:
+        table.add_row(f"Recall@{report['k']}", f"{report['recall']:.3f}")
+        table.add_row("Avg Query Time", f"{report['avg_query_ms']:.2f} ms")
+        table.add_row("P95 Query Time", f"{report['p95_query_ms']:.2f} ms")
+        table.add_row("Exact Query Time", f"{report['exact_query_ms']:.2f} ms")
+
+    console.print(table)
+    if report["index"] != report["index_factory"]:
+        console.print(
+            f"[yellow]{report['index_factory']} needs more vectors to train; "
+            "it will be built automatically once enough are added[/yellow]"
+        )
+
+
+@app.command()
+def reembed(
+    model: str = typer.Option(None, "--model", "-m", help="Switch to this embedding model"),
+    backend: str = typer.Option(None, "--backend", "-b", help="Switch backend: torch or onnx"),
+    workers: int = typer.Option(None, "--workers", "-w", help="Worker processes (default: all)"),
+):
+    """Re-embed every memory, e.g. after changing the embedding model"""
+    manager = get_manager()
 
-    from .config import Config
+    with console.status("[bold cyan]Re-embedding memories..."):
+        count = manager.reembed(model, backend=backend, workers=workers)
 
+    if model or backend:
+        config = Config.load()
+        config.embedding.model_name = model or config.embedding.model_name
+        config.embedding.backend = backend or config.embedding.backend
+        config.save()
+
+    console.print(f"[green]✓[/green] Re-embedded {count} memories")
+
+
+@app.command()
+def serve():
+    """Run a local daemon that keeps models and indexes loaded for other commands"""
+    from .memory_manager import MemoryManager
+
+    config = Config.load()
+    path = daemon.socket_path(config)
+
+    with console.status("[bold cyan]Loading models and index..."):
+        try:
+            manager = MemoryManager(config, batching=True)
+        except Exception as e:
+            console.print(f"[red]Error initializing Memory Agent: {e}[/red]")
+            raise typer.Exit(1)
+
+    console.print(f"[green]✓[/green] Serving on [cyan]{path}[/cyan] (Ctrl+C to stop)")
+    try:
+        daemon.serve(manager, path)
+    except RuntimeError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    except KeyboardInterrupt:
+        pass
+    console.print("Daemon stopped")
+
+
+@app.command()
+def setup():
+    """Initial setup and configuration"""
     console.print("[bold cyan]Memory Agent Setup[/bold cyan]\n")
 
     # Check if already set up
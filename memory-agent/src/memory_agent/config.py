@@ -15,6 +15,21 @@ class EmbeddingConfig(BaseModel):
     model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
     device: str = "cpu"
     batch_size: int = 32
+    # "torch" (sentence-transformers) or "onnx" (ONNX Runtime, int8-quantized, CPU only)
+    backend: str = "torch"
+    # Query embeddings kept in the LRU cache; 0 disables it
+    cache_size: int = 1024
+    # Persist the cache to embedding_cache.db in the data directory
+    cache_persist: bool = True
+    # Under concurrent load (memory serve), wait this long to batch queries together
+    max_batch_wait_ms: float = 2.0
+    # Long memories are also indexed in chunks of this many tokens (capped at
+    # the model's sequence length); 0 embeds only the start of each memory
+    chunk_tokens: int = 200
+    # Tokens of trailing sentences repeated at the start of the next chunk
+    chunk_overlap: int = 40
+    # How chunk hits score their memory: "max" (best chunk) or "sum" (all chunks)
+    chunk_scoring: str = "max"
 
 
 class LLMConfig(BaseModel):
@@ -24,6 +39,16 @@ class LLMConfig(BaseModel):
     context_size: int = 2048
     n_threads: Optional[int] = None
     n_gpu_layers: int = 0
+    # llama-cpp: save the model state after each prompt template's fixed prefix and
+    # restore it instead of re-evaluating the prefix on every call
+    prefix_cache: bool = True
+    # Ollama: how long the server keeps the model loaded after a call
+    keep_alive: str = "30m"
+    # Tokens of memories packed into an ask prompt; by default whatever context_size
+    # leaves after the prompt template, the question and the answer
+    context_budget: Optional[int] = None
+    # Memories sharing at least this fraction of words with a better hit are left out
+    context_dedupe: float = 0.9
 
 
 class StorageConfig(BaseModel):
@@ -31,6 +56,42 @@ class StorageConfig(BaseModel):
 
     data_dir: Path = Field(default_factory=lambda: Path.home() / ".memory-agent" / "data")
     models_dir: Path = Field(default_factory=lambda: Path.home() / ".memory-agent" / "models")
+    # FAISS index_factory string: "Flat", "HNSW32,Flat", "IVF1024,Flat", "IVF1024,PQ32", ...
+    index_factory: str = "Flat"
+    # FAISS ParameterSpace string applied at search time, e.g. "nprobe=16" or "efSearch=128"
+    index_search_params: str = ""
+    # Vectors required before a trainable (IVF/PQ) index is trained
+    index_train_size: int = 10000
+    # Candidates a quantized (SQ/PQ) index returns for exact rescoring against
+    # full-precision vectors kept on disk in vectors.f32; 0 disables both
+    rerank_candidates: int = 100
+    # Similarity metric for new stores: "l2", "ip" or "cosine"
+    metric: str = "l2"
+    # Split new stores into shards by "hash" of ID or "time" bucket; "" keeps one store
+    shard_by: str = ""
+    # Shards of a hash-sharded store
+    shards: int = 8
+    # Bucket of a time-sharded store: "year", "month" or "day"
+    shard_time_bucket: str = "month"
+    # Threads searching shards in parallel; None uses one per core
+    shard_workers: Optional[int] = None
+    # Also keep each embedding in the metadata (the index always holds it)
+    store_embeddings: bool = False
+    # Keep latency histograms in metrics.db so `memory stats` covers earlier runs
+    persist_metrics: bool = True
+
+
+class SearchConfig(BaseModel):
+    """Search configuration"""
+
+    # "vector" (embeddings), "lexical" (BM25 over memory text) or "hybrid" (both, fused)
+    mode: str = "vector"
+    # How hybrid search fuses the two rankings: "rrf" (reciprocal rank) or "weighted"
+    fusion: str = "rrf"
+    # RRF constant: a memory ranked r-th in a ranking scores 1 / (rrf_k + r) from it
+    rrf_k: int = 60
+    # Weighted fusion: share of the score from BM25, each ranking scaled to [0, 1]
+    lexical_weight: float = 0.5
 
 
 class Config(BaseModel):
@@ -39,6 +100,7 @@ class Config(BaseModel):
     embedding: EmbeddingConfig = Field(default_factory=EmbeddingConfig)
     llm: LLMConfig = Field(default_factory=LLMConfig)
     storage: StorageConfig = Field(default_factory=StorageConfig)
+    search: SearchConfig = Field(default_factory=SearchConfig)
 
     @classmethod
     def load(cls, path: Optional[Path] = None) -> "Config":
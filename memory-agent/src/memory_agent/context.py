@@ -0,0 +1,81 @@
+"""
+Token-budgeted packing of search results into an LLM prompt context
+Near-duplicate memories are dropped and the last one that fits is trimmed
+"""
+
+import re
+from typing import Callable, List, Set, Tuple
+
+from .chunking import chunk_text
+from .models import SearchResult
+
+# A memory trimmed to fewer tokens than this is left out instead
+MIN_TRIMMED_TOKENS = 32
+
+# Separator between context entries
+SEPARATOR = "\n\n"
+
+
+def pack_context(
+    results: List[SearchResult],
+    budget: int,
+    count_tokens: Callable[[str], int],
+    dedupe_threshold: float = 0.9,
+) -> Tuple[str, List[str], int]:
+    """Pack results, best first, into a context of at most budget tokens
+
+    Entries are numbered "[n] content". A result whose words overlap an
+    already packed one by at least dedupe_threshold (Jaccard) is skipped.
+    The first result that does not fit is trimmed on sentence boundaries to
+    the remaining budget, and packing stops there. Returns the context, the
+    IDs of the packed memories and the context's token count.
+    """
+    entries: List[str] = []
+    sources: List[str] = []
+    packed_words: List[Set[str]] = []
+    used = 0
+    separator_tokens = count_tokens(SEPARATOR)
+
+    for result in results:
+        words = _words(result.memory.content)
+        if any(_jaccard(words, other) >= dedupe_threshold for other in packed_words):
+            continue
+
+        header = f"[{len(entries) + 1}] "
+        entry = header + result.memory.content
+        tokens = count_tokens(entry) + (separator_tokens if entries else 0)
+        if used + tokens > budget:
+            remaining = budget - used - count_tokens(header) - (separator_tokens if entries else 0)
+            if remaining >= MIN_TRIMMED_TOKENS or not entries:
+                trimmed = _trim(result.memory.content, remaining, count_tokens)
+                if trimmed:
+                    entries.append(header + trimmed)
+                    sources.append(result.memory.id)
+            break
+
+        entries.append(entry)
+        sources.append(result.memory.id)
+        packed_words.append(words)
+        used += tokens
+
+    context = SEPARATOR.join(entries)
+    return context, sources, count_tokens(context) if context else 0
+
+
+def _trim(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """Leading sentences of text fitting in max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    return chunk_text(text, max_tokens=max_tokens, overlap=0, count_tokens=count_tokens)[0]
+
+
+def _words(text: str) -> Set[str]:
+    """Lowercased word set of text"""
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two word sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,315 @@
+"""
+Resident daemon keeping a MemoryManager warm behind a local Unix socket
+The CLI forwards commands to it when it is running
+"""
+
+import builtins
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from .config import Config
+from .models import Memory, QueryResult, SearchResult
+
+# MemoryManager methods the daemon serves
+METHODS = {
+    "add_memory",
+    "add_memories",
+    "search",
+    "get_memory",
+    "list_memories",
+    "delete_memory",
+    "ask",
+    "ask_stream",
+    "reindex",
+    "reembed",
+    "get_stats",
+}
+
+# Methods that only read the stores and may run concurrently with each other
+READ_METHODS = {"search", "get_memory", "list_memories", "get_stats"}
+
+# Methods returning (result, iterator of text); the text is sent as it is produced
+STREAM_METHODS = {"ask_stream"}
+
+
+def socket_path(config: Config) -> Path:
+    """Where the daemon for this configuration listens"""
+    return config.storage.data_dir / "daemon.sock"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Serve newline-delimited JSON requests on one connection
+
+    Each request gets one {"result"} or {"error"} line. Streaming methods
+    follow their result with {"chunk"} lines and end with {"end": true}, or
+    with an {"error"} line if generation fails midway.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line)
+            try:
+                if request["method"] not in METHODS:
+                    raise ValueError(f"Unknown method {request['method']!r}")
+                method = getattr(self.server.manager, request["method"])
+                # Reads share the stores, and their embeds are batched together;
+                # writes (and the LLM, which is not thread-safe) take turns
+                if request["method"] in READ_METHODS:
+                    lock = self.server.lock.read()
+                else:
+                    lock = self.server.lock.write()
+                with lock:
+                    result = method(**request.get("params", {}))
+                    if request["method"] in STREAM_METHODS:
+                        # Streams hold the lock until the last chunk is sent
+                        self._stream(*result)
+                        continue
+                response = {"result": _to_json(result)}
+            except Exception as e:
+                response = {"error": str(e), "type": type(e).__name__}
+            self.wfile.write(_dumps(response))
+            self.wfile.flush()
+
+    def _stream(self, result, chunks: Iterator[str]):
+        """Send a streaming method's result, then each chunk as it is produced"""
+        self.wfile.write(_dumps({"result": _to_json(result)}))
+        self.wfile.flush()
+        for chunk in chunks:
+            self.wfile.write(_dumps({"chunk": chunk}))
+            self.wfile.flush()
+        self.wfile.write(_dumps({"end": True}))
+        self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class _ReadWriteLock:
+    """Many readers or one writer; waiting writers block new readers"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.writing and not self.waiting_writers)
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                self.condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            self.condition.wait_for(lambda: not self.writing and not self.readers)
+            self.waiting_writers -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+
+def serve(manager, path: Path):
+    """Serve manager on a Unix socket until interrupted"""
+    path = Path(path)
+    if path.exists():
+        if connect(path) is not None:
+            raise RuntimeError(f"A daemon is already listening on {path}")
+        # Left behind by a daemon that did not shut down cleanly
+        path.unlink()
+
+    # Loaded once here instead of on the first request
+    manager.embeddings._load_model()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    server = _Server(str(path), _Handler)
+    os.chmod(path, 0o600)
+    server.manager = manager
+    server.lock = _ReadWriteLock()
+    if threading.current_thread() is threading.main_thread():
+        # shutdown() waits for serve_forever() to return, so it cannot run on this thread
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+        manager.vector_store.close()
+
+
+def connect(path: Path) -> Optional["DaemonClient"]:
+    """Client for the daemon listening on path, or None if none is running"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return DaemonClient(sock)
+
+
+class DaemonClient:
+    """MemoryManager stand-in that forwards calls to a running daemon"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.stream = sock.makefile("rwb")
+
+    def add_memory(self, content: str, tags: List[str] = None, metadata: dict = None) -> Memory:
+        """Add a new memory"""
+        return Memory(**self._call("add_memory", content=content, tags=tags, metadata=metadata))
+
+    def add_memories(self, items: Iterable[Union[str, dict, Memory]], batch_size: int = 256) -> int:
+        """Add many memories, sending one batch per request so large imports stream"""
+        items = iter(items)
+        added = 0
+        while True:
+            chunk = list(islice(items, batch_size))
+            if not chunk:
+                return added
+            added += self._call("add_memories", items=chunk, batch_size=batch_size)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        filters: dict = None,
+        min_score: Optional[float] = None,
+        mode: Optional[str] = None,
+    ) -> List[SearchResult]:
+        """Search for similar memories"""
+        results = self._call(
+            "search", query=query, limit=limit, filters=filters, min_score=min_score, mode=mode
+        )
+        return [SearchResult(**result) for result in results]
+
+    def get_memory(self, memory_id: str, with_embedding: bool = False) -> Optional[Memory]:
+        """Get a specific memory by ID"""
+        memory = self._call("get_memory", memory_id=memory_id, with_embedding=with_embedding)
+        return Memory(**memory) if memory is not None else None
+
+    def list_memories(self, limit: int = 10, filters: dict = None) -> List[Memory]:
+        """List the newest memories"""
+        return [Memory(**m) for m in self._call("list_memories", limit=limit, filters=filters)]
+
+    def delete_memory(self, memory_id: str):
+        """Delete a memory"""
+        self._call("delete_memory", memory_id=memory_id)
+
+    def ask(self, question: str, top_k: int = 5) -> QueryResult:
+        """Ask a question and get LLM-generated answer"""
+        return QueryResult(**self._call("ask", question=question, top_k=top_k))
+
+    def ask_stream(self, question: str, top_k: int = 5) -> Tuple[List[str], Iterator[str]]:
+        """Ask a question, streaming the answer
+
+        The connection carries the stream, so exhaust the iterator before
+        making another call.
+        """
+        sources = self._call("ask_stream", question=question, top_k=top_k)
+        return sources, self._chunks()
+
+    def reindex(
+        self,
+        index_factory: Optional[str] = None,
+        metric: Optional[str] = None,
+        eval_queries: int = 100,
+    ) -> dict:
+        """Rebuild the vector index and report its recall and latency"""
+        return self._call(
+            "reindex", index_factory=index_factory, metric=metric, eval_queries=eval_queries
+        )
+
+    def reembed(
+        self,
+        model_name: Optional[str] = None,
+        backend: Optional[str] = None,
+        workers: Optional[int] = None,
+        batch_size: int = 1024,
+    ) -> int:
+        """Re-embed every memory, optionally with a different model or backend"""
+        return self._call(
+            "reembed",
+            model_name=model_name,
+            backend=backend,
+            workers=workers,
+            batch_size=batch_size,
+        )
+
+    def get_stats(self) -> dict:
+        """Get memory statistics"""
+        return self._call("get_stats")
+
+    def close(self):
+        """Close the connection"""
+        self.stream.close()
+        self.sock.close()
+
+    def _call(self, method: str, **params):
+        """Send one request and wait for its response"""
+        self.stream.write(_dumps({"method": method, "params": _to_json(params)}))
+        self.stream.flush()
+        return self._read()["result"]
+
+    def _chunks(self) -> Iterator[str]:
+        """Yield streamed chunks until the end of the response"""
+        while True:
+            response = self._read()
+            if response.get("end"):
+                return
+            yield response["chunk"]
+
+    def _read(self) -> dict:
+        """Read one response line, re-raising errors it reports"""
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("Memory daemon closed the connection")
+
+        response = json.loads(line)
+        if "error" in response:
+            error = getattr(builtins, response["type"], None)
+            if not (isinstance(error, type) and issubclass(error, Exception)):
+                error = RuntimeError
+            raise error(response["error"])
+        return response
+
+
+def _to_json(value):
+    """Convert models, datetimes and containers of them into JSON values"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _dumps(message: dict) -> bytes:
+    """Encode one protocol line"""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
@@ -0,0 +1,141 @@
+"""
+LRU cache of text embeddings, optionally persisted to SQLite
+Entries are keyed by model name and a hash of the normalized text
+"""
+
+import hashlib
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class EmbeddingCache:
+    """Bounded LRU of embeddings
+
+    The in-memory LRU holds up to max_size vectors. With a path, entries and
+    hit/miss counters are also written through to SQLite, so repeated
+    queries stay cached across CLI invocations; the file is trimmed to the
+    max_size most recently used entries.
+    """
+
+    def __init__(self, max_size: int = 1024, path: Optional[Path] = None):
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Monotonic use counter ordering persisted entries by recency
+        self.clock = 0
+
+        self.db = None
+        if path is not None:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(path), check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+            counters = dict(self.db.execute("SELECT name, value FROM counters"))
+            self.hits = counters.get("hits", 0)
+            self.misses = counters.get("misses", 0)
+            row = self.db.execute("SELECT MAX(used) FROM embeddings").fetchone()
+            self.clock = row[0] or 0
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        """Cached embedding of text under model_name, or None"""
+        key = _key(model_name, text)
+        vector = self.entries.get(key)
+        if vector is not None:
+            self.entries.move_to_end(key)
+        elif self.db is not None:
+            row = self.db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype="float32")
+                self._remember(key, vector)
+
+        if vector is None:
+            self.misses += 1
+            self._count("misses")
+            return None
+
+        self.hits += 1
+        if self.db is not None:
+            self.clock += 1
+            self.db.execute("UPDATE embeddings SET used = ? WHERE key = ?", (self.clock, key))
+        self._count("hits")
+        return vector.copy()
+
+    def put(self, model_name: str, text: str, vector: np.ndarray):
+        """Cache the embedding of text under model_name"""
+        if self.max_size <= 0:
+            return
+        key = _key(model_name, text)
+        vector = np.asarray(vector, dtype="float32").copy()
+        self._remember(key, vector)
+
+        if self.db is not None:
+            self.clock += 1
+            self.db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, used) VALUES (?, ?, ?)",
+                (key, vector.tobytes(), self.clock),
+            )
+            self.db.execute(
+                "DELETE FROM embeddings WHERE key NOT IN "
+                "(SELECT key FROM embeddings ORDER BY used DESC LIMIT ?)",
+                (self.max_size,),
+            )
+            self.db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        if self.db is not None:
+            size = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        else:
+            size = len(self.entries)
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+    def close(self):
+        """Close the cache database"""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert into the in-memory LRU, evicting the least recently used"""
+        self.entries[key] = vector
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def _count(self, name: str):
+        """Increment a persisted counter; increments keep concurrent processes consistent"""
+        if self.db is None:
+            return
+        self.db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+        self.db.commit()
+
+
+def _key(model_name: str, text: str) -> str:
+    """Cache key from the model name and a hash of whitespace-normalized text"""
+    normalized = " ".join(text.split())
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
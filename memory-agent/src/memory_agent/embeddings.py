@@ -2,46 +2,150 @@
 Embedding engine for converting text to vectors
 """
 
-from typing import List, Optional
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from .embedding_cache import EmbeddingCache
+from .hash_embeddings import HashEncoder, hash_dimension
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# Embedding backends: SentenceTransformer on torch, or the int8 ONNX Runtime port
+BACKENDS = ("torch", "onnx")
 
 
 class EmbeddingEngine:
-    """Handles text to vector conversion"""
+    """Handles text to vector conversion
+
+    Single-text embeds go through an LRU cache of cache_size entries (0
+    disables it), persisted at cache_path when given, so repeated queries
+    skip the forward pass and, on a warm cache, loading the model at all.
+    Texts embedded once, such as memories being stored, pass cache=False so
+    they do not evict hot queries.
+
+    The "onnx" backend runs the same model through ONNX Runtime with int8
+    weights, caching the quantized model under models_dir.
+
+    A model_name of "hash://<dimension>" selects the feature-hashing encoder
+    instead (see hash_embeddings), whatever the backend: deterministic unit
+    vectors with no model to load, for tests and load tests. It is not
+    cached, since hashing is cheaper than a cache lookup.
+    """
 
     def __init__(
         self,
         model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
         device: str = "cpu",
         batch_size: int = 32,
+        cache_size: int = 1024,
+        cache_path: Optional[Path] = None,
+        backend: str = "torch",
+        models_dir: Optional[Path] = None,
+        num_threads: Optional[int] = None,
     ):
+        # Hash models have no backend of their own; "hash" marks them
+        self.hash_dimension = hash_dimension(model_name)
+        if self.hash_dimension:
+            backend = "hash"
+        elif backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {list(BACKENDS)}")
+
         self.model_name = model_name
         self.device = device
         self.batch_size = batch_size
-        self.model: Optional[SentenceTransformer] = None
+        self.backend = backend
+        self.models_dir = models_dir
+        # Intra-op threads for the model; None leaves the runtime's default
+        self.num_threads = num_threads
+        # Backends embed slightly differently, so their cache entries are kept apart
+        self.cache_key = model_name if backend == "torch" else f"{model_name}#{backend}"
+        self.model: Optional["SentenceTransformer"] = None
+        self.cache = (
+            EmbeddingCache(cache_size, cache_path)
+            if cache_size > 0 and not self.hash_dimension
+            else None
+        )
 
     def _load_model(self):
-        """Lazy load the model"""
-        if self.model is None:
+        """Lazy load the model, importing torch only when it is first needed"""
+        if self.model is None and self.hash_dimension:
+            self.model = HashEncoder(self.hash_dimension)
+        elif self.model is None and self.backend == "onnx":
+            from .onnx_embeddings import OnnxEncoder
+
+            self.model = OnnxEncoder(
+                self.model_name, cache_dir=self.models_dir, num_threads=self.num_threads
+            )
+        elif self.model is None:
+            from sentence_transformers import SentenceTransformer
+
+            if self.num_threads:
+                import torch
+
+                torch.set_num_threads(self.num_threads)
             self.model = SentenceTransformer(self.model_name, device=self.device)
 
-    def embed(self, text: str) -> np.ndarray:
-        """Convert single text to embedding"""
+    def embed(self, text: str, cache: bool = True) -> np.ndarray:
+        """Convert single text to embedding, through the cache unless cache is False"""
+        cache = cache and self.cache is not None
+        if cache:
+            cached = self.cache.get(self.cache_key, text)
+            if cached is not None:
+                return cached
+
         self._load_model()
-        return self.model.encode(text, convert_to_numpy=True)
+        embedding = self.model.encode(text, convert_to_numpy=True)
+        if cache:
+            self.cache.put(self.cache_key, text, embedding)
+        return embedding
 
-    def embed_batch(self, texts: List[str]) -> np.ndarray:
+    def embed_batch(self, texts: List[str], show_progress: bool = True) -> np.ndarray:
         """Convert batch of texts to embeddings"""
         self._load_model()
         return self.model.encode(
             texts,
             batch_size=self.batch_size,
             convert_to_numpy=True,
-            show_progress_bar=True,
+            show_progress_bar=show_progress,
         )
 
+    def count_tokens(self, text: str) -> int:
+        """Number of model tokens in text, excluding special tokens"""
+        self._load_model()
+        if self.backend == "onnx":
+            return len(self.model.tokenizer.encode(text, add_special_tokens=False).ids)
+        return len(self.model.tokenizer.encode(text, add_special_tokens=False, verbose=False))
+
+    @property
+    def max_tokens(self) -> int:
+        """Longest text, in tokens, the model embeds without truncating"""
+        self._load_model()
+        if self.backend == "onnx":
+            special = self.model.tokenizer.num_special_tokens_to_add(False)
+        else:
+            special = self.model.tokenizer.num_special_tokens_to_add()
+        return self.model.max_seq_length - special
+
+    def pool(self, workers: Optional[int] = None) -> "EmbeddingPool":
+        """Start worker processes embedding batches with this engine's model"""
+        return EmbeddingPool(self, workers)
+
+    def cache_stats(self) -> dict:
+        """Embedding cache hit/miss counters and size"""
+        if self.cache is None:
+            return {"hits": 0, "misses": 0, "size": 0}
+        return self.cache.stats()
+
     def similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """Calculate cosine similarity between two vectors"""
         return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
@@ -51,3 +155,164 @@ class EmbeddingEngine:
         """Get embedding dimension"""
         self._load_model()
         return self.model.get_sentence_embedding_dimension()
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embed() calls into batched forward passes
+
+    Callers on any thread, or on an event loop via embed_async(), enqueue
+    texts; one worker thread owns the engine and its cache and encodes
+    everything queued, up to batch_size, in a single call. A lone caller is
+    encoded immediately, so latency without contention is unchanged; once
+    requests are queuing up, the worker also waits up to max_wait_ms for
+    more before encoding. Other attributes are the wrapped engine's.
+    """
+
+    def __init__(self, engine: EmbeddingEngine, max_wait_ms: float = 2.0):
+        self.engine = engine
+        self.max_wait = max_wait_ms / 1000
+        self.queue: "queue.Queue[Optional[Tuple[str, Future, bool]]]" = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, text: str, cache: bool = True) -> Future:
+        """Queue a text, returning a future for its embedding"""
+        future: Future = Future()
+        self.queue.put((text, future, cache))
+        return future
+
+    def embed(self, text: str, cache: bool = True) -> np.ndarray:
+        """Convert single text to embedding, batched with concurrent callers"""
+        return self.submit(text, cache).result()
+
+    async def embed_async(self, text: str, cache: bool = True) -> np.ndarray:
+        """Convert single text to embedding without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(text, cache))
+
+    def close(self):
+        """Stop the worker once the queue is drained"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def _run(self):
+        """Collect queued requests into batches and encode them"""
+        while True:
+            request = self.queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.engine.batch_size:
+                # Only wait for stragglers once others are already queuing
+                timeout = deadline - time.monotonic() if len(batch) > 1 else 0
+                try:
+                    if timeout > 0:
+                        request = self.queue.get(timeout=timeout)
+                    else:
+                        request = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)
+                    break
+                batch.append(request)
+            self._encode(batch)
+
+    def _encode(self, batch: List[Tuple[str, Future, bool]]):
+        """Encode one batch, serving cache hits, and resolve its futures"""
+        texts = [text for text, _, _ in batch]
+        cache = self.engine.cache
+        # Requests made with cache=False neither read nor fill the cache
+        cached = [bool(cache) and use_cache for _, _, use_cache in batch]
+        try:
+            vectors = [
+                cache.get(self.engine.cache_key, text) if use_cache else None
+                for text, use_cache in zip(texts, cached)
+            ]
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if missing:
+                encoded = self.engine.embed_batch([texts[i] for i in missing], show_progress=False)
+                for i, vector in zip(missing, encoded):
+                    vectors[i] = vector
+                    if cached[i]:
+                        cache.put(self.engine.cache_key, texts[i], vector)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+
+class EmbeddingPool:
+    """Worker processes that embed batches in parallel, one model copy each
+
+    Each embed_batch() call is split into batch_size chunks spread over the
+    workers, and cores are divided between them so they do not oversubscribe
+    the CPU. Use as a context manager to shut the workers down.
+    """
+
+    def __init__(self, engine: EmbeddingEngine, workers: Optional[int] = None):
+        cores = os.cpu_count() or 1
+        self.engine = engine
+        self.workers = workers or cores
+        self.batch_size = engine.batch_size
+        # Spawned, since forking a process that may already hold torch threads is unsafe
+        self.executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                engine.model_name,
+                engine.device,
+                engine.batch_size,
+                engine.backend,
+                engine.models_dir,
+                max(1, cores // self.workers),
+            ),
+        )
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed texts across the workers, preserving order"""
+        if not texts:
+            return np.empty((0, self.engine.dimension), dtype=np.float32)
+        chunks = [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        return np.concatenate(list(self.executor.map(_embed_chunk, chunks)))
+
+    def close(self):
+        """Stop the workers"""
+        self.executor.shutdown()
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Engine of the current pool worker process
+_worker_engine: Optional[EmbeddingEngine] = None
+
+
+def _init_worker(model_name, device, batch_size, backend, models_dir, num_threads):
+    """Load the model once per pool worker"""
+    global _worker_engine
+    _worker_engine = EmbeddingEngine(
+        model_name,
+        device=device,
+        batch_size=batch_size,
+        cache_size=0,
+        backend=backend,
+        models_dir=models_dir,
+        num_threads=num_threads,
+    )
+    _worker_engine._load_model()
+
+
+def _embed_chunk(texts: List[str]) -> np.ndarray:
+    """Embed one chunk in a pool worker"""
+    return _worker_engine.embed_batch(texts, show_progress=False)
@@ -0,0 +1,119 @@
+"""
+Feature-hashing embedding "model" for tests and load tests
+Maps words and word pairs to signed vector slots, so it needs no model
+download, no torch and no network, and is identical across runs and machines
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+# Model names of the form hash://<dimension>
+HASH_SCHEME = "hash://"
+
+# Longest text counted as fitting, as for common transformer encoders, so
+# chunking behaves the same as with a real model
+MAX_SEQ_LENGTH = 512
+
+# Weight of a word pair relative to a single word
+BIGRAM_WEIGHT = 0.5
+
+_WORD = re.compile(r"\w+")
+
+
+def hash_dimension(model_name: str) -> Optional[int]:
+    """Dimension of a hash://<dimension> model name, or None for other models"""
+    if not model_name.startswith(HASH_SCHEME):
+        return None
+    dimension = model_name[len(HASH_SCHEME) :]
+    if not dimension.isdigit() or int(dimension) < 1:
+        raise ValueError(f"Invalid hash model {model_name!r}, expected e.g. {HASH_SCHEME}384")
+    return int(dimension)
+
+
+class HashTokenizer:
+    """Lowercased word tokenizer, with the tokenizer methods the engine uses"""
+
+    def encode(self, text: str, add_special_tokens: bool = True, **kwargs) -> List[str]:
+        return _WORD.findall(text.lower())
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        return 0
+
+
+class HashEncoder:
+    """SentenceTransformer-compatible encoder built on feature hashing
+
+    Each word and adjacent word pair adds +-1 (pairs +-BIGRAM_WEIGHT) to a
+    slot chosen by a keyed BLAKE2 hash, and the sum is scaled to unit length.
+    Texts sharing words are therefore similar, enough for search to return
+    sensible results, while unrelated texts are nearly orthogonal. Text with
+    no words hashes as a whole.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.max_seq_length = MAX_SEQ_LENGTH
+        self.tokenizer = HashTokenizer()
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        """Embed one text or a list of texts, like SentenceTransformer.encode"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # One bincount over the whole batch beats accumulating row by row
+        rows, slots, weights = [], [], []
+        for row, text in enumerate(sentences):
+            for slot, weight in self._features(text):
+                rows.append(row)
+                slots.append(slot)
+                weights.append(weight)
+        flat = np.asarray(rows, dtype=np.int64) * self.dimension + np.asarray(slots, np.int64)
+        embeddings = np.bincount(
+            flat, weights=weights, minlength=len(sentences) * self.dimension
+        ).reshape(len(sentences), self.dimension)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        # Features can cancel out exactly; fall back to the whole text's slot
+        for row in np.flatnonzero(norms[:, 0] == 0):
+            slot, sign = _feature(self.dimension, sentences[row])
+            embeddings[row, slot], norms[row] = sign, 1.0
+        embeddings = (embeddings / norms).astype(np.float32)
+
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _features(self, text: str) -> List[Tuple[int, float]]:
+        """Signed slots of the words and word pairs of text"""
+        words = self.tokenizer.encode(text)
+        if not words:
+            slot, sign = _feature(self.dimension, text)
+            return [(slot, sign)]
+        features = [_feature(self.dimension, word) for word in words]
+        features += [
+            (slot, sign * BIGRAM_WEIGHT)
+            for slot, sign in (
+                _feature(self.dimension, f"{a} {b}") for a, b in zip(words, words[1:])
+            )
+        ]
+        return features
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature(dimension: int, feature: str) -> Tuple[int, int]:
+    """Slot and sign of a feature, stable across processes unlike hash()"""
+    digest = hashlib.blake2b(feature.encode(), digest_size=8, person=b"memagent").digest()
+    value = int.from_bytes(digest, "little")
+    return value % dimension, 1 if value >> 63 else -1
@@ -4,11 +4,53 @@ Supports both llama-cpp-python and Ollama backends
 """
 
 import os
-from typing import Optional
+import time
+from typing import Dict, Iterator, Optional
+
+# Longest answer answer_question generates, in tokens
+ANSWER_MAX_TOKENS = 300
+
+# Ollama has no local tokenizer, so its token counts are estimated
+CHARS_PER_TOKEN = 4
+
+# Prompt templates keep their fixed instructions ahead of every placeholder,
+# so the text before the first "{" is a prefix shared by all calls
+ANSWER_TEMPLATE = """Answer the question based on the context provided.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+SUMMARIZE_TEMPLATE = """Summarize the following text.
+
+Text:
+{text}
+
+Summary in {max_length} words or less:"""
+
+KEYWORDS_TEMPLATE = """Extract 5-10 important keywords from this text.
+Return only the keywords, comma-separated.
+
+Text: {text}
+
+Keywords:"""
 
 
 class LLMInterface:
-    """Local LLM interface with multiple backend support"""
+    """Local LLM interface with multiple backend support
+
+    With prefix_cache, llama-cpp evaluates each template's fixed prefix once
+    and saves the model state after it; later calls restore that state and
+    only evaluate the rest of the prompt. Ollama keeps the model loaded for
+    keep_alive between calls and reuses matching prompt prefixes itself.
+
+    Each generation records last_timings: time to the first piece
+    (prompt_ms, i.e. prompt evaluation) and from there to the end
+    (generate_ms).
+    """
 
     def __init__(
         self,
@@ -17,14 +59,23 @@ class LLMInterface:
         n_threads: Optional[int] = None,
         n_gpu_layers: int = 0,
         backend: str = "auto",  # auto, llama-cpp, or ollama
+        prefix_cache: bool = True,
+        keep_alive: Optional[str] = "30m",
     ):
         self.model_path = model_path
         self.context_size = context_size
         self.n_threads = n_threads or os.cpu_count()
         self.n_gpu_layers = n_gpu_layers
         self.backend = backend
+        self.prefix_cache = prefix_cache
+        self.keep_alive = keep_alive
         self.model = None
         self._backend_type = None
+        # llama-cpp states saved after each template prefix
+        self._prefix_states: Dict[str, object] = {}
+        # Prefix the model's KV cache currently starts with
+        self._active_prefix: Optional[str] = None
+        self.last_timings: Optional[dict] = None
 
     def _load_model(self):
         """Lazy load the model"""
@@ -75,58 +126,139 @@ class LLMInterface:
                 "Or install the Ollama CLI: https://ollama.ai"
             )
 
-    def generate(self, prompt: str, max_tokens: int = 512) -> str:
+    def generate(self, prompt: str, max_tokens: int = 512, prefix: Optional[str] = None) -> str:
         """Generate text from prompt"""
+        return "".join(self.generate_stream(prompt, max_tokens, prefix)).strip()
+
+    def generate_stream(
+        self, prompt: str, max_tokens: int = 512, prefix: Optional[str] = None
+    ) -> Iterator[str]:
+        """Generate text from prompt, yielding pieces as the model produces them
+
+        prefix is a leading part of prompt shared with other calls, whose
+        evaluated state can be reused. The model is loaded on the first
+        next(), so load errors surface there.
+        """
         self._load_model()
+        start = time.perf_counter()
+        prefix_cached = False
 
         if self._backend_type == "llama-cpp":
+            if prefix and self.prefix_cache:
+                prefix_cached = self._restore_prefix(prefix)
+            else:
+                self._active_prefix = None
             output = self.model(
                 prompt,
                 max_tokens=max_tokens,
                 temperature=0.7,
                 stop=["</s>", "\n\n\n"],
+                stream=True,
             )
-            return output["choices"][0]["text"].strip()
+            pieces = (chunk["choices"][0]["text"] for chunk in output)
 
         elif self._backend_type == "ollama":
             response = self.model.generate(
-                model="llama2", prompt=prompt, options={"num_predict": max_tokens}  # Default model
+                model="llama2",  # Default model
+                prompt=prompt,
+                options={"num_predict": max_tokens},
+                stream=True,
+                keep_alive=self.keep_alive,
             )
-            return response["response"].strip()
+            pieces = (chunk["response"] for chunk in response)
 
-        return "LLM backend not configured. Set model_path or install Ollama."
+        else:
+            yield "LLM backend not configured. Set model_path or install Ollama."
+            return
 
-    def summarize(self, text: str, max_length: int = 200) -> str:
-        """Summarize text"""
-        prompt = f"""Summarize the following text in {max_length} words or less.
+        # Leading whitespace is dropped, matching generate()
+        started = False
+        first = None
+        count = 0
+        for piece in pieces:
+            if first is None:
+                first = time.perf_counter()
+            count += 1
+            if not started:
+                piece = piece.lstrip()
+                started = bool(piece)
+            if piece:
+                yield piece
 
-Text:
-{text}
+        end = time.perf_counter()
+        first = first or end
+        self.last_timings = {
+            "prompt_ms": (first - start) * 1000,
+            "generate_ms": (end - first) * 1000,
+            "pieces": count,
+            "prefix_cached": prefix_cached,
+        }
 
-Summary:"""
-        return self.generate(prompt, max_tokens=max_length * 2)
+    def count_tokens(self, text: str) -> int:
+        """Tokens text takes up in the model's context (estimated for Ollama)"""
+        self._load_model()
+        if self._backend_type == "llama-cpp":
+            return len(self.model.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+        return -(-len(text) // CHARS_PER_TOKEN)
 
-    def answer_question(self, question: str, context: str, max_tokens: int = 300) -> str:
-        """Answer a question given context"""
-        prompt = f"""Answer the question based on the context provided.
+    def _restore_prefix(self, prefix: str) -> bool:
+        """Put the llama-cpp model in its state after prefix; True if that state was cached
 
-Context:
-{context}
+        The first use of a prefix evaluates and saves it. llama-cpp skips
+        any leading prompt tokens already in its KV cache, so only the rest
+        of the prompt is evaluated.
+        """
+        if self._active_prefix == prefix:
+            # The previous call used the same prefix, so the KV cache still starts with it
+            return True
 
-Question: {question}
+        state = self._prefix_states.get(prefix)
+        if state is None:
+            self.model.reset()
+            # Tokenized like llama-cpp tokenizes completion prompts, so the tokens match
+            self.model.eval(self.model.tokenize(prefix.encode("utf-8"), special=True))
+            self._prefix_states[prefix] = self.model.save_state()
+        else:
+            self.model.load_state(state)
+        self._active_prefix = prefix
+        return state is not None
 
-Answer:"""
-        return self.generate(prompt, max_tokens=max_tokens)
+    def summarize(self, text: str, max_length: int = 200) -> str:
+        """Summarize text"""
+        return self._generate_from(
+            SUMMARIZE_TEMPLATE, max_length * 2, text=text, max_length=max_length
+        )
 
-    def extract_keywords(self, text: str) -> list[str]:
-        """Extract keywords from text"""
-        prompt = f"""Extract 5-10 important keywords from this text.
-Return only the keywords, comma-separated.
+    def answer_question(
+        self, question: str, context: str, max_tokens: int = ANSWER_MAX_TOKENS
+    ) -> str:
+        """Answer a question given context"""
+        return self._generate_from(ANSWER_TEMPLATE, max_tokens, question=question, context=context)
 
-Text: {text}
+    def answer_question_stream(
+        self, question: str, context: str, max_tokens: int = ANSWER_MAX_TOKENS
+    ) -> Iterator[str]:
+        """Answer a question given context, yielding the answer as it is generated"""
+        return self.generate_stream(
+            ANSWER_TEMPLATE.format(question=question, context=context),
+            max_tokens=max_tokens,
+            prefix=_prefix(ANSWER_TEMPLATE),
+        )
 
-Keywords:"""
-        result = self.generate(prompt, max_tokens=100)
+    def extract_keywords(self, text: str) -> list[str]:
+        """Extract keywords from text"""
+        result = self._generate_from(KEYWORDS_TEMPLATE, 100, text=text)
         # Parse comma-separated keywords
         keywords = [k.strip() for k in result.split(",")]
         return [k for k in keywords if k][:10]
+
+    def _generate_from(self, template: str, max_tokens: int, **fields) -> str:
+        """Generate from a filled-in prompt template, reusing its prefix"""
+        return self.generate(
+            template.format(**fields), max_tokens=max_tokens, prefix=_prefix(template)
+        )
+
+
+def _prefix(template: str) -> str:
+    """Fixed text of a template before its first placeholder"""
+    return template.split("{", 1)[0]
@@ -3,39 +3,124 @@ Memory Manager - Core orchestrator for memory operations
 TODO: Implement core memory management logic
 """
 
-from typing import List, Optional
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
+
+from .chunking import chunk_text
 from .config import Config
-from .embeddings import EmbeddingEngine
-from .llm import LLMInterface
+from .context import pack_context
+from .embeddings import EmbeddingBatcher, EmbeddingEngine
+from .llm import ANSWER_MAX_TOKENS, ANSWER_TEMPLATE, LLMInterface
+from .metrics import Metrics
 from .models import Memory, QueryResult, SearchResult
-from .vector_store import VectorStore
+from .sharded_store import ShardedVectorStore, holds_unsharded_store
+from .vector_store import VectorStore, disk_size
+
+# Chunk scoring modes: a memory scores as its best chunk, or all its chunks summed
+CHUNK_SCORING = ("max", "sum")
+
+# Search modes: embeddings only, BM25 over memory text only, or both fused
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+# Hybrid fusion methods: reciprocal rank fusion or a weighted sum of scaled scores
+FUSIONS = ("rrf", "weighted")
+
+# Searches fetch this many hits per requested result, since a memory's
+# chunks can take several of them before hits are collapsed
+CHUNK_SEARCH_FACTOR = 4
 
 
 class MemoryManager:
-    """Orchestrates memory operations"""
+    """Orchestrates memory operations
 
-    def __init__(self, config: Optional[Config] = None):
+    With batching, single-text embeds from concurrent callers are coalesced
+    by an EmbeddingBatcher; long-running services such as the daemon use it.
+
+    Memories longer than the chunk size are split into overlapping chunks.
+    The memory's own vector embeds its content, which the model truncates to
+    about the first chunk; each later chunk is stored as an extra row with
+    ID "<id>#<n>" pointing back at the memory. Searches run over all rows and
+    collapse chunk hits into their memory, scored by its best chunk or by
+    the sum of its chunks (embedding.chunk_scoring).
+
+    Searches can also rank by BM25 over memory text, which catches exact
+    identifiers, host names and error codes that embeddings blur, or fuse
+    both rankings (search.mode, search.fusion).
+
+    Latencies of add_memory, search and ask, and of their stages (embed,
+    index_search, hydrate, lexical_search, llm_prompt_eval, llm_generate),
+    are recorded in histograms, kept in metrics.db when storage.persist_metrics
+    is set.
+    """
+
+    def __init__(self, config: Optional[Config] = None, batching: bool = False):
         self.config = config or Config.load()
+        self.batching = batching
+        if self.config.embedding.chunk_scoring not in CHUNK_SCORING:
+            raise ValueError(
+                f"Unknown chunk scoring {self.config.embedding.chunk_scoring!r}, "
+                f"expected one of {CHUNK_SCORING}"
+            )
+        _check_mode(self.config.search.mode)
+        if self.config.search.fusion not in FUSIONS:
+            raise ValueError(
+                f"Unknown fusion {self.config.search.fusion!r}, expected one of {FUSIONS}"
+            )
 
         # Initialize components
-        self.embeddings = EmbeddingEngine(
-            model_name=self.config.embedding.model_name,
-            device=self.config.embedding.device,
-            batch_size=self.config.embedding.batch_size,
+        self.metrics = Metrics(
+            self.config.storage.data_dir / "metrics.db"
+            if self.config.storage.persist_metrics
+            else None
         )
 
-        self.vector_store = VectorStore(data_dir=str(self.config.storage.data_dir))
+        self.embeddings = self._embedding_engine(
+            self.config.embedding.model_name, self.config.embedding.backend
+        )
+
+        storage = self.config.storage
+        store_options = dict(
+            # Hash models know their dimension up front; others would have to be
+            # loaded, so new stores assume the default model's 384
+            dimension=self.embeddings.hash_dimension or 384,
+            index_factory=storage.index_factory,
+            index_search_params=storage.index_search_params,
+            index_train_size=storage.index_train_size,
+            metric=storage.metric,
+            metrics=self.metrics,
+            rerank_candidates=storage.rerank_candidates,
+        )
+        # A store keeps the layout it was created with, whatever the config says now
+        if (storage.data_dir / "shards.json").exists() or (
+            storage.shard_by and not holds_unsharded_store(storage.data_dir)
+        ):
+            self.vector_store = ShardedVectorStore(
+                data_dir=str(storage.data_dir),
+                shard_by=storage.shard_by or "hash",
+                n_shards=storage.shards,
+                time_bucket=storage.shard_time_bucket,
+                workers=storage.shard_workers,
+                **store_options,
+            )
+        else:
+            self.vector_store = VectorStore(data_dir=str(storage.data_dir), **store_options)
 
         self.llm = LLMInterface(
             model_path=self.config.llm.model_path,
             context_size=self.config.llm.context_size,
             n_threads=self.config.llm.n_threads,
             n_gpu_layers=self.config.llm.n_gpu_layers,
+            prefix_cache=self.config.llm.prefix_cache,
+            keep_alive=self.config.llm.keep_alive,
         )
 
     def add_memory(self, content: str, tags: List[str] = None, metadata: dict = None) -> Memory:
         """Add a new memory"""
+        start = time.perf_counter()
         # Create memory object
         memory = Memory(
             content=content,
@@ -43,42 +128,151 @@ class MemoryManager:
             metadata=metadata or {},
         )
 
-        # Generate embedding
-        embedding = self.embeddings.embed(content)
+        # Generate embedding; stored content is rarely embedded again, so it skips the cache
+        with self.metrics.timer("embed"):
+            embedding = self.embeddings.embed(content, cache=False)
         memory.embedding = embedding.tolist()
 
-        # Store in vector database
-        self.vector_store.add(
-            id=memory.id,
-            vector=embedding,
-            metadata=memory.model_dump(),
-        )
+        # Store in vector database, with any further chunks of long content
+        chunk_ids, chunk_metadatas = self._chunk_rows(memory)
+        if chunk_ids:
+            self.vector_store.add_batch(
+                ids=[memory.id] + chunk_ids,
+                vectors=np.vstack(
+                    [
+                        embedding,
+                        self.embeddings.embed_batch(
+                            [m["content"] for m in chunk_metadatas], show_progress=False
+                        ),
+                    ]
+                ),
+                metadatas=[self._stored_metadata(memory)] + chunk_metadatas,
+            )
+        else:
+            self.vector_store.add(
+                id=memory.id,
+                vector=embedding,
+                metadata=self._stored_metadata(memory),
+            )
 
+        self.metrics.record("add_memory", (time.perf_counter() - start) * 1000)
         return memory
 
-    def search(self, query: str, limit: int = 10, filters: dict = None) -> List[SearchResult]:
-        """Search for similar memories"""
-        # Embed query
-        query_vector = self.embeddings.embed(query)
+    def add_memories(self, items: Iterable[Union[str, dict, Memory]], batch_size: int = 256) -> int:
+        """Add many memories, embedding and persisting them one chunk at a time
+
+        Items may be plain strings, Memory objects, or dicts of Memory fields.
+        The input is consumed lazily, so arbitrarily large iterables are fine.
+        Returns the number of memories added.
+        """
+        items = iter(items)
+        added = 0
+
+        while True:
+            chunk = list(islice(items, batch_size))
+            if not chunk:
+                break
+
+            memories = [_to_memory(item) for item in chunk]
+            ids = [memory.id for memory in memories]
+            metadatas = [self._stored_metadata(memory) for memory in memories]
+            for memory in memories:
+                chunk_ids, chunk_metadatas = self._chunk_rows(memory)
+                ids += chunk_ids
+                metadatas += chunk_metadatas
+
+            # Memories embed their full content; chunk rows their chunk
+            embeddings = self.embeddings.embed_batch(
+                [memory.content for memory in memories]
+                + [m["content"] for m in metadatas[len(memories) :]],
+                show_progress=False,
+            )
+            for memory, embedding in zip(memories, embeddings):
+                memory.embedding = embedding.tolist()
+
+            self.vector_store.add_batch(ids=ids, vectors=embeddings, metadatas=metadatas)
+            added += len(memories)
 
-        # Search vector store
-        results = self.vector_store.search(query_vector, top_k=limit)
+        return added
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        filters: dict = None,
+        min_score: Optional[float] = None,
+        mode: Optional[str] = None,
+    ) -> List[SearchResult]:
+        """Search for similar memories
+
+        filters may hold "tags" (memories must carry all of them), "since" and
+        "until" (datetimes or ISO strings, until exclusive). mode overrides
+        search.mode; min_score only applies to vector similarities. Lexical
+        scores are BM25 relevance and hybrid scores come from the fusion, so
+        neither is on the vector scale.
+        """
+        start = time.perf_counter()
+        mode = mode or self.config.search.mode
+        _check_mode(mode)
+        filters = _store_filters(filters)
+
+        # Chunks of one memory may take several hits before they are collapsed
+        top_k = limit * CHUNK_SEARCH_FACTOR if self.config.embedding.chunk_tokens > 0 else limit
+        if mode == "hybrid":
+            top_k = max(top_k, limit * CHUNK_SEARCH_FACTOR)
+
+        rankings = []
+        metadatas = {}
+        if mode != "lexical":
+            with self.metrics.timer("embed"):
+                query_vector = self.embeddings.embed(query)
+            results = self.vector_store.search(
+                query_vector, top_k=top_k, min_score=min_score, filters=filters
+            )
+            rankings.append(self._collapse(results, metadatas))
+        if mode != "vector":
+            results = self.vector_store.search_text(query, top_k=top_k, filters=filters)
+            rankings.append(self._collapse(results, metadatas))
+
+        scores = rankings[0] if len(rankings) == 1 else self._fuse(*rankings)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
 
         # Convert to SearchResult objects
         search_results = []
-        for result in results:
-            memory = Memory(**result["metadata"])
-            score = result["score"]
-            search_results.append(SearchResult(memory=memory, score=score))
+        for id in ranked:
+            if id not in metadatas:
+                # Only a chunk matched; fetch the memory it belongs to
+                parent = self.vector_store.get(id)
+                if parent is None:
+                    continue
+                metadatas[id] = parent["metadata"]
+            memory = Memory(**metadatas[id])
+            search_results.append(SearchResult(memory=memory, score=scores[id]))
 
+        self.metrics.record("search", (time.perf_counter() - start) * 1000)
         return search_results
 
-    def get_memory(self, memory_id: str) -> Optional[Memory]:
-        """Get a specific memory by ID"""
+    def get_memory(self, memory_id: str, with_embedding: bool = False) -> Optional[Memory]:
+        """Get a specific memory by ID, reconstructing its embedding on request
+
+        The ID of one of a long memory's chunks gets the memory it belongs to.
+        """
         result = self.vector_store.get(memory_id)
-        if result:
-            return Memory(**result["metadata"])
-        return None
+        if result and result["metadata"].get("parent"):
+            memory_id = result["metadata"]["parent"]
+            result = self.vector_store.get(memory_id)
+        if not result:
+            return None
+
+        memory = Memory(**result["metadata"])
+        if with_embedding and memory.embedding is None:
+            memory.embedding = self.vector_store.get_vector(memory_id).tolist()
+        return memory
+
+    def list_memories(self, limit: int = 10, filters: dict = None) -> List[Memory]:
+        """List the newest memories, optionally filtered like search()"""
+        results = self.vector_store.recent(limit, filters=_store_filters(filters))
+        return [Memory(**result["metadata"]) for result in results]
 
     def delete_memory(self, memory_id: str):
         """Delete a memory"""
@@ -86,29 +280,249 @@ class MemoryManager:
 
     def ask(self, question: str, top_k: int = 5) -> QueryResult:
         """Ask a question and get LLM-generated answer"""
-        # Search for relevant memories
-        search_results = self.search(question, limit=top_k)
-
-        # Compile context
-        context = "\n\n".join(
-            [f"[{i+1}] {result.memory.content}" for i, result in enumerate(search_results)]
-        )
+        start = time.perf_counter()
+        context, sources, context_tokens = self._ask_context(question, top_k)
 
         # Generate answer
         answer = self.llm.answer_question(question, context)
-
-        # Extract source IDs
-        sources = [result.memory.id for result in search_results]
+        self._record_llm(start)
 
         return QueryResult(
             answer=answer,
             sources=sources,
+            timings=self.llm.last_timings,
+            context_tokens=context_tokens,
         )
 
+    def ask_stream(self, question: str, top_k: int = 5) -> Tuple[List[str], Iterator[str]]:
+        """Ask a question, streaming the answer
+
+        Returns the source IDs, found up front, and an iterator yielding the
+        answer text as the LLM generates it.
+        """
+        start = time.perf_counter()
+        context, sources, _ = self._ask_context(question, top_k)
+
+        def pieces():
+            yield from self.llm.answer_question_stream(question, context)
+            self._record_llm(start)
+
+        return sources, pieces()
+
+    def _record_llm(self, start: float):
+        """Record an ask that started at start, with its LLM stages"""
+        self.metrics.record("ask", (time.perf_counter() - start) * 1000)
+        if self.llm.last_timings:
+            self.metrics.record("llm_prompt_eval", self.llm.last_timings["prompt_ms"])
+            self.metrics.record("llm_generate", self.llm.last_timings["generate_ms"])
+
+    def _ask_context(self, question: str, top_k: int) -> Tuple[str, List[str], int]:
+        """Prompt context, source IDs and context tokens for a question
+
+        Memories are packed into llm.context_budget tokens, or by default
+        into what context_size leaves after the prompt and the answer.
+        """
+        # Search for relevant memories
+        search_results = self.search(question, limit=top_k)
+
+        budget = self.config.llm.context_budget
+        if budget is None:
+            prompt = ANSWER_TEMPLATE.format(question=question, context="")
+            # The model also counts a beginning-of-sequence token
+            budget = self.config.llm.context_size - ANSWER_MAX_TOKENS
+            budget -= self.llm.count_tokens(prompt) + 1
+
+        return pack_context(
+            search_results,
+            budget,
+            self.llm.count_tokens,
+            dedupe_threshold=self.config.llm.context_dedupe,
+        )
+
+    def reindex(
+        self,
+        index_factory: Optional[str] = None,
+        metric: Optional[str] = None,
+        eval_queries: int = 100,
+    ) -> dict:
+        """Rebuild the vector index and report its recall and latency
+
+        The report's "index" is the index actually built; "index_factory" is
+        the configured one, which differs while it waits for enough vectors
+        to train.
+        """
+        self.vector_store.rebuild(index_factory, metric=metric)
+        report = self.vector_store.evaluate(n_queries=eval_queries)
+        report["index_factory"] = self.vector_store.index_factory
+        return report
+
+    def reembed(
+        self,
+        model_name: Optional[str] = None,
+        backend: Optional[str] = None,
+        workers: Optional[int] = None,
+        batch_size: int = 1024,
+    ) -> int:
+        """Re-embed every memory, optionally with a different model or backend
+
+        Embedding runs on a pool of worker processes (all cores by default).
+        The new model is used for searches from then on; returns the number of
+        vectors re-embedded, chunks included. Chunk boundaries are kept.
+        """
+        engine = self._embedding_engine(
+            model_name or self.embeddings.model_name, backend or self.embeddings.backend
+        )
+
+        with engine.pool(workers) as pool:
+            count = self.vector_store.reembed(
+                lambda metadatas: pool.embed_batch([m["content"] for m in metadatas]),
+                dimension=engine.dimension,
+                batch_size=batch_size,
+            )
+
+        if isinstance(self.embeddings, EmbeddingBatcher):
+            # Stop the old engine's batching thread
+            self.embeddings.close()
+        self.embeddings = engine
+        return count
+
+    def _embedding_engine(self, model_name: str, backend: str) -> EmbeddingEngine:
+        """Embedding engine for a model, configured from the embedding settings"""
+        engine = EmbeddingEngine(
+            model_name=model_name,
+            device=self.config.embedding.device,
+            batch_size=self.config.embedding.batch_size,
+            backend=backend,
+            models_dir=self.config.storage.models_dir,
+            cache_size=self.config.embedding.cache_size,
+            cache_path=(
+                self.config.storage.data_dir / "embedding_cache.db"
+                if self.config.embedding.cache_persist
+                else None
+            ),
+        )
+        if self.batching:
+            return EmbeddingBatcher(engine, max_wait_ms=self.config.embedding.max_batch_wait_ms)
+        return engine
+
+    def _collapse(self, results: List[dict], metadatas: dict) -> Dict[str, float]:
+        """Score per memory from store hits, combining the hits of its chunks
+
+        Metadata of hits that are memories themselves is collected into metadatas.
+        """
+        hits = {}
+        for result in results:
+            id = result["metadata"].get("parent") or result["id"]
+            hits.setdefault(id, []).append(result["score"])
+            if id == result["id"]:
+                metadatas[id] = result["metadata"]
+        combine = sum if self.config.embedding.chunk_scoring == "sum" else max
+        return {id: combine(scores) for id, scores in hits.items()}
+
+    def _fuse(self, dense: Dict[str, float], lexical: Dict[str, float]) -> Dict[str, float]:
+        """Fuse vector and BM25 scores per memory into one hybrid score"""
+        search = self.config.search
+        fused = dict.fromkeys(list(dense) + list(lexical), 0.0)
+        if search.fusion == "rrf":
+            # Only ranks count, so the two score scales never need reconciling
+            for ranking in (dense, lexical):
+                for rank, id in enumerate(sorted(ranking, key=ranking.get, reverse=True), 1):
+                    fused[id] += 1.0 / (search.rrf_k + rank)
+            return fused
+
+        weights = (1 - search.lexical_weight, search.lexical_weight)
+        for ranking, weight in zip((dense, lexical), weights):
+            top = max(ranking.values(), default=0.0)
+            for id, score in ranking.items():
+                fused[id] += weight * (score / top if top > 0 else 0.0)
+        return fused
+
+    def _chunk_rows(self, memory: Memory) -> Tuple[List[str], List[dict]]:
+        """IDs and metadata of the extra chunk rows for a memory, if it is long"""
+        max_tokens = self.config.embedding.chunk_tokens
+        if max_tokens <= 0:
+            return [], []
+        max_tokens = min(max_tokens, self.embeddings.max_tokens)
+
+        chunks = chunk_text(
+            memory.content,
+            max_tokens=max_tokens,
+            overlap=self.config.embedding.chunk_overlap,
+            count_tokens=self.embeddings.count_tokens,
+        )
+        # The first chunk is covered by the memory's own vector
+        ids, metadatas = [], []
+        for number, chunk in enumerate(chunks[1:], start=1):
+            ids.append(f"{memory.id}#{number}")
+            metadatas.append(
+                {
+                    "parent": memory.id,
+                    "chunk": number,
+                    "content": chunk,
+                    "tags": memory.tags,
+                    "timestamp": memory.timestamp.isoformat(),
+                }
+            )
+        return ids, metadatas
+
+    def _stored_metadata(self, memory: Memory) -> dict:
+        """Metadata persisted for a memory; the embedding lives in the index"""
+        if self.config.storage.store_embeddings:
+            return memory.model_dump()
+        return memory.model_dump(exclude={"embedding"})
+
     def get_stats(self) -> dict:
-        """Get memory statistics"""
+        """Get memory statistics
+
+        storage maps data files to their size in bytes, storage_used is their
+        total; latency holds count, mean and p50/p95/p99 milliseconds per
+        stage, and avg_query_time the mean search time (None before any).
+        """
+        storage = self.vector_store.disk_usage()
+        for name in ("embedding_cache.db", "metrics.db"):
+            storage[name] = disk_size(self.config.storage.data_dir / name)
+        latency = self.metrics.summary()
         return {
-            "total_memories": self.vector_store.count(),
-            "storage_used": "TODO",
-            "avg_query_time": "TODO",
+            "total_memories": self.vector_store.count_memories(),
+            "storage_used": sum(storage.values()),
+            "storage": storage,
+            "avg_query_time": latency["search"]["mean_ms"] if "search" in latency else None,
+            "latency": latency,
+            "embedding_cache": self.embeddings.cache_stats(),
         }
+
+
+def _to_memory(item: Union[str, dict, Memory]) -> Memory:
+    """Coerce a bulk-ingest item into a Memory"""
+    if isinstance(item, Memory):
+        return item
+    if isinstance(item, str):
+        return Memory(content=item)
+    return Memory(**item)
+
+
+def _check_mode(mode: str):
+    """Reject unknown search modes"""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+
+
+def _store_filters(filters: Optional[dict]) -> Optional[dict]:
+    """Normalize search filters into the vector store's form"""
+    if not filters:
+        return None
+
+    unknown = set(filters) - {"tags", "since", "until"}
+    if unknown:
+        raise ValueError(f"Unsupported filters: {', '.join(sorted(unknown))}")
+
+    tags = filters.get("tags")
+    if isinstance(tags, str):
+        tags = [tags]
+    since, until = (
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in (filters.get("since"), filters.get("until"))
+    )
+    if not tags and since is None and until is None:
+        return None
+    return {"tags": tags, "since": since, "until": until}
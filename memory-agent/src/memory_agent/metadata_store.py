@@ -0,0 +1,340 @@
+"""
+SQLite-backed metadata store for the vector store
+Rows are keyed by FAISS label and read lazily per search hit
+"""
+
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    label INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    metadata TEXT NOT NULL,
+    timestamp TEXT,
+    parent TEXT
+);
+CREATE INDEX IF NOT EXISTS memories_timestamp ON memories (timestamp);
+CREATE INDEX IF NOT EXISTS memories_parent ON memories (parent);
+CREATE TABLE IF NOT EXISTS memory_tags (
+    tag TEXT NOT NULL,
+    label INTEGER NOT NULL,
+    PRIMARY KEY (tag, label)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS memory_tags_label ON memory_tags (label);
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5 (content);
+"""
+
+# Bumped whenever existing rows need migrating; stored as PRAGMA user_version
+SCHEMA_VERSION = 4
+
+# SQLite's default limit on bound parameters per statement
+_MAX_PARAMS = 999
+
+
+class MetadataStore:
+    """Memory metadata in SQLite, keyed by FAISS label with a unique ID index
+
+    Rows with a parent are extra chunks of a long memory; they carry the
+    parent's tags and timestamp so filters apply to them too, but are not
+    listed or counted as memories of their own.
+
+    Memory content (not chunk rows, whose text the memory already holds) is
+    also kept in an FTS5 full-text index, rowid = label, for BM25 search.
+
+    Writes are not committed until commit(). The vector store's WAL is the
+    durability boundary: writes are logged before they reach this store, and
+    replaying them is idempotent, so a lost or unfinished commit is harmless.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        exists = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories'"
+        ).fetchone()
+        if exists:
+            self._migrate()
+        else:
+            self.db.executescript(SCHEMA)
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def put_many(self, rows: Iterable[Tuple[int, str, dict]]):
+        """Insert or replace (label, id, metadata) rows along with their index entries"""
+        rows = [tuple(row) for row in rows]
+        # Replacing an ID drops its old row, whose index entries must go with it
+        stale = [label for label, _, _ in rows]
+        stale += self.labels_of([id for _, id, _ in rows]).values()
+        self._delete_indexed(stale)
+
+        self.db.executemany(
+            "INSERT OR REPLACE INTO memories (label, id, metadata, timestamp, parent) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (label, id, _dumps(metadata), metadata.get("timestamp"), metadata.get("parent"))
+                for label, id, metadata in rows
+            ],
+        )
+        self.db.executemany(
+            "INSERT OR IGNORE INTO memory_tags (tag, label) VALUES (?, ?)",
+            [(tag, label) for label, _, metadata in rows for tag in metadata.get("tags") or []],
+        )
+        self.db.executemany(
+            "INSERT INTO memories_fts (rowid, content) VALUES (?, ?)",
+            [
+                (label, metadata.get("content", ""))
+                for label, _, metadata in rows
+                if metadata.get("parent") is None
+            ],
+        )
+
+    def delete_labels(self, labels: List[int]):
+        """Delete rows by label"""
+        self._delete_indexed(labels)
+        self.db.executemany("DELETE FROM memories WHERE label = ?", [(label,) for label in labels])
+
+    def labels_of(self, ids: List[str]) -> Dict[str, int]:
+        """Labels currently stored for any of the given IDs"""
+        found = {}
+        for chunk in _chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                self.db.execute(
+                    f"SELECT id, label FROM memories WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+            )
+        return found
+
+    def children_of(self, ids: List[str]) -> Dict[str, int]:
+        """IDs and labels of the chunk rows belonging to any of the given IDs"""
+        found = {}
+        for chunk in _chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                self.db.execute(
+                    f"SELECT id, label FROM memories WHERE parent IN ({placeholders})", chunk
+                ).fetchall()
+            )
+        return found
+
+    def get(self, id: str) -> Optional[dict]:
+        """Get the label and metadata stored for an ID"""
+        row = self.db.execute("SELECT label, metadata FROM memories WHERE id = ?", (id,)).fetchone()
+        if row is None:
+            return None
+        return {"label": row[0], "metadata": json.loads(row[1])}
+
+    def get_by_labels(self, labels: List[int]) -> Dict[int, Tuple[str, dict]]:
+        """Fetch (id, metadata) for a set of labels"""
+        found = {}
+        for chunk in _chunks(labels):
+            placeholders = ",".join("?" * len(chunk))
+            for label, id, metadata in self.db.execute(
+                f"SELECT label, id, metadata FROM memories WHERE label IN ({placeholders})", chunk
+            ):
+                found[label] = (id, json.loads(metadata))
+        return found
+
+    def labels(self) -> np.ndarray:
+        """All stored labels, ascending"""
+        rows = self.db.execute("SELECT label FROM memories ORDER BY label").fetchall()
+        return np.array([row[0] for row in rows], dtype="int64")
+
+    def scan(self, batch_size: int = 1024) -> Iterable[List[Tuple[int, dict]]]:
+        """Stream (label, metadata) rows in label order, batch_size at a time"""
+        last = -1
+        while True:
+            rows = self.db.execute(
+                "SELECT label, metadata FROM memories WHERE label > ? ORDER BY label LIMIT ?",
+                (last, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            yield [(label, json.loads(metadata)) for label, metadata in rows]
+            last = rows[-1][0]
+
+    def filter_labels(
+        self,
+        tags: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> np.ndarray:
+        """Labels carrying all of the given tags within [since, until), ascending"""
+        where, params = _where(tags, since, until)
+        rows = self.db.execute(f"SELECT label FROM memories {where} ORDER BY label", params)
+        return np.array([row[0] for row in rows], dtype="int64")
+
+    def recent(
+        self,
+        limit: int = 10,
+        tags: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> List[Tuple[str, dict]]:
+        """Newest (id, metadata) memories matching the filters, leaving out chunk rows"""
+        where, params = _where(tags, since, until, "parent IS NULL")
+        rows = self.db.execute(
+            f"SELECT id, metadata FROM memories {where} "
+            "ORDER BY timestamp DESC, label DESC LIMIT ?",
+            params + [limit],
+        )
+        return [(id, json.loads(metadata)) for id, metadata in rows]
+
+    def search_text(
+        self,
+        query: str,
+        limit: int = 10,
+        tags: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> List[Tuple[int, str, dict, float]]:
+        """Best BM25 matches for query as (label, id, metadata, score), highest first
+
+        A memory matches if it contains any query term. Terms joined by
+        punctuation (host names, error codes, paths) match as phrases.
+        """
+        match = _match_query(query)
+        if not match:
+            return []
+        where, params = _where(tags, since, until, "memories_fts MATCH ?")
+        rows = self.db.execute(
+            "SELECT label, id, metadata, -rank FROM memories_fts "
+            f"JOIN memories ON memories.label = memories_fts.rowid {where} "
+            "ORDER BY rank LIMIT ?",
+            [match] + params + [limit],
+        )
+        return [(label, id, json.loads(metadata), score) for label, id, metadata, score in rows]
+
+    def count_memories(self) -> int:
+        """Number of memories, not counting their chunk rows"""
+        return self.db.execute("SELECT COUNT(*) FROM memories WHERE parent IS NULL").fetchone()[0]
+
+    def max_label(self) -> int:
+        """Highest stored label, or -1 when empty"""
+        row = self.db.execute("SELECT MAX(label) FROM memories").fetchone()
+        return -1 if row[0] is None else row[0]
+
+    def import_json(self, path: Path):
+        """One-shot import of a legacy metadata.json snapshot"""
+        with open(path) as f:
+            data = json.load(f)
+        # Stores from before the ID map recorded index positions instead of labels,
+        # and all of them duplicated the embedding into the metadata
+        self.put_many(
+            (
+                entry.get("label", entry.get("position")),
+                id,
+                {key: value for key, value in entry["metadata"].items() if key != "embedding"},
+            )
+            for id, entry in data.items()
+        )
+        self.commit()
+
+    def _migrate(self):
+        """Bring rows written by older versions up to SCHEMA_VERSION"""
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        # Columns are added before the schema script, which indexes them
+        if version < 2:
+            self.db.execute("ALTER TABLE memories ADD COLUMN timestamp TEXT")
+        if version < 3:
+            self.db.execute("ALTER TABLE memories ADD COLUMN parent TEXT")
+        self.db.executescript(SCHEMA)
+
+        stripped = 0
+        if version < 1:
+            # Embeddings used to be duplicated into metadata; the index already holds them
+            stripped = self.db.execute(
+                "UPDATE memories SET metadata = json_remove(metadata, '$.embedding') "
+                "WHERE json_type(metadata, '$.embedding') IS NOT NULL"
+            ).rowcount
+
+        if version < 2:
+            # Tags and timestamps get indexed copies so searches can filter on them
+            self.db.execute("UPDATE memories SET timestamp = json_extract(metadata, '$.timestamp')")
+            self.db.execute(
+                "INSERT OR IGNORE INTO memory_tags (tag, label) "
+                "SELECT tags.value, memories.label FROM memories, json_each(memories.metadata, "
+                "'$.tags') AS tags WHERE json_type(memories.metadata, '$.tags') = 'array'"
+            )
+
+        if version < 4:
+            # Memory text gets a full-text index for lexical search
+            self.db.execute(
+                "INSERT INTO memories_fts (rowid, content) "
+                "SELECT label, json_extract(metadata, '$.content') FROM memories "
+                "WHERE parent IS NULL"
+            )
+
+        self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.commit()
+        if stripped:
+            self.db.execute("VACUUM")
+
+    def _delete_indexed(self, labels: List[int]):
+        """Drop the tag and text index entries of the given labels"""
+        params = [(label,) for label in labels]
+        self.db.executemany("DELETE FROM memory_tags WHERE label = ?", params)
+        self.db.executemany("DELETE FROM memories_fts WHERE rowid = ?", params)
+
+    def commit(self):
+        """Commit pending writes"""
+        self.db.commit()
+
+    def close(self):
+        """Close the database"""
+        self.db.close()
+
+
+def _dumps(metadata: dict) -> str:
+    """Serialize metadata compactly"""
+    return json.dumps(metadata, separators=(",", ":"))
+
+
+def _where(
+    tags: Optional[List[str]], since: Optional[str], until: Optional[str], *extra: str
+) -> Tuple[str, list]:
+    """WHERE clause selecting rows with all tags inside the time range, plus extra clauses"""
+    clauses, params = list(extra), []
+    for tag in tags or []:
+        clauses.append("label IN (SELECT label FROM memory_tags WHERE tag = ?)")
+        params.append(tag)
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("timestamp < ?")
+        params.append(until)
+    if not clauses:
+        return "", params
+    return "WHERE " + " AND ".join(clauses), params
+
+
+def _match_query(text: str) -> str:
+    """FTS5 query matching any whitespace-separated term of text
+
+    Terms are reduced to their word characters and quoted, so FTS5 syntax in
+    the text is inert and "db-01.example.com" becomes the phrase
+    "db 01 example com", matching the same tokens in order.
+    """
+    terms = []
+    for word in text.split():
+        tokens = re.findall(r"\w+", word)
+        if tokens:
+            terms.append('"' + " ".join(tokens) + '"')
+    return " OR ".join(terms)
+
+
+def _chunks(values: list) -> Iterable[list]:
+    """Split values into chunks that fit in one statement"""
+    for start in range(0, len(values), _MAX_PARAMS):
+        yield values[start : start + _MAX_PARAMS]
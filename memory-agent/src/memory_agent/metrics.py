@@ -0,0 +1,177 @@
+"""
+Per-stage latency histograms, optionally persisted to SQLite
+Histograms have fixed log-spaced buckets, so they stay small however many
+calls they record
+"""
+
+import atexit
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Bucket i holds latencies in [MIN_MS * GROWTH**i, MIN_MS * GROWTH**(i + 1)); the
+# first and last buckets also catch everything below and above the range
+MIN_MS = 0.01
+GROWTH = 2**0.25
+BUCKETS = 96
+
+PERCENTILES = (50, 95, 99)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    stage TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (stage, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS totals (
+    stage TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total_ms REAL NOT NULL
+);
+"""
+
+
+class Metrics:
+    """Latency histograms per named stage ("embed", "index_search", ...)
+
+    Records are buffered in memory. With a path, they are added to the
+    database at most every flush_interval seconds, on summary() and at exit;
+    additions are increments, so every process using the file (CLI runs,
+    the daemon) accumulates into the same histograms.
+    """
+
+    def __init__(self, path: Optional[Path] = None, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # Records not yet flushed: per stage, bucket counts and [count, total_ms]
+        self.pending: Dict[str, List[int]] = {}
+        self.pending_totals: Dict[str, List[float]] = {}
+        self.last_flush = time.monotonic()
+
+        self.db = None
+        # Without a database, flushed records accumulate here instead
+        self.buckets: Dict[str, List[int]] = {}
+        self.totals: Dict[str, List[float]] = {}
+        if path is not None:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(path), check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+            atexit.register(self.close)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time the enclosed block as one call of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def record(self, stage: str, ms: float):
+        """Record one call of stage taking ms milliseconds"""
+        with self.lock:
+            self.pending.setdefault(stage, [0] * BUCKETS)[_bucket(ms)] += 1
+            totals = self.pending_totals.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += ms
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Add buffered records to the histograms"""
+        with self.lock:
+            pending, totals = self.pending, self.pending_totals
+            self.pending, self.pending_totals = {}, {}
+            self.last_flush = time.monotonic()
+            if self.db is None:
+                for stage, counts in pending.items():
+                    merged = self.buckets.setdefault(stage, [0] * BUCKETS)
+                    for i, count in enumerate(counts):
+                        merged[i] += count
+                for stage, (count, total_ms) in totals.items():
+                    merged = self.totals.setdefault(stage, [0, 0.0])
+                    merged[0] += count
+                    merged[1] += total_ms
+                return
+
+            self.db.executemany(
+                "INSERT INTO buckets (stage, bucket, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (stage, bucket) DO UPDATE SET count = count + excluded.count",
+                [
+                    (stage, i, count)
+                    for stage, counts in pending.items()
+                    for i, count in enumerate(counts)
+                    if count
+                ],
+            )
+            self.db.executemany(
+                "INSERT INTO totals (stage, count, total_ms) VALUES (?, ?, ?) "
+                "ON CONFLICT (stage) DO UPDATE SET count = count + excluded.count, "
+                "total_ms = total_ms + excluded.total_ms",
+                [(stage, count, total_ms) for stage, (count, total_ms) in totals.items()],
+            )
+            self.db.commit()
+
+    def summary(self) -> Dict[str, dict]:
+        """Call count, mean and p50/p95/p99 latency in milliseconds per stage"""
+        self.flush()
+        with self.lock:
+            if self.db is None:
+                buckets = {stage: list(counts) for stage, counts in self.buckets.items()}
+                totals = {stage: list(values) for stage, values in self.totals.items()}
+            else:
+                buckets = {}
+                for stage, bucket, count in self.db.execute(
+                    "SELECT stage, bucket, count FROM buckets"
+                ):
+                    buckets.setdefault(stage, [0] * BUCKETS)[bucket] = count
+                totals = {
+                    stage: [count, total_ms]
+                    for stage, count, total_ms in self.db.execute(
+                        "SELECT stage, count, total_ms FROM totals"
+                    )
+                }
+
+        summary = {}
+        for stage, (count, total_ms) in sorted(totals.items()):
+            if not count:
+                continue
+            summary[stage] = {"count": count, "mean_ms": total_ms / count}
+            for percentile in PERCENTILES:
+                summary[stage][f"p{percentile}_ms"] = _percentile(buckets[stage], percentile)
+        return summary
+
+    def close(self):
+        """Flush and close the metrics database"""
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+            atexit.unregister(self.close)
+
+
+def _bucket(ms: float) -> int:
+    """Histogram bucket of a latency"""
+    if ms <= MIN_MS:
+        return 0
+    return min(int(math.log(ms / MIN_MS, GROWTH)), BUCKETS - 1)
+
+
+def _percentile(counts: List[int], percentile: float) -> float:
+    """Latency at a percentile, as the geometric middle of the bucket it falls in"""
+    target = sum(counts) * percentile / 100
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if count and seen >= target:
+            return MIN_MS * GROWTH ** (i + 0.5)
+    return 0.0
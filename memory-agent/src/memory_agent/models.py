@@ -43,3 +43,7 @@ class QueryResult(BaseModel):
     answer: str
     sources: List[str]
     confidence: Optional[float] = None
+    # Prompt evaluation and generation times of the LLM call, in milliseconds
+    timings: Optional[dict] = None
+    # Tokens of memories packed into the prompt
+    context_tokens: Optional[int] = None
@@ -0,0 +1,159 @@
+"""
+ONNX Runtime embedding backend
+Runs sentence-transformers models with dynamic int8 quantization and a local
+tokenizer, without importing torch
+"""
+
+import json
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+# Model files a sentence-transformers repo ships alongside its ONNX export
+ONNX_FILE = "onnx/model.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+MODULES_FILE = "modules.json"
+POOLING_FILE = "1_Pooling/config.json"
+SBERT_CONFIG_FILE = "sentence_bert_config.json"
+TOKENIZER_CONFIG_FILE = "tokenizer_config.json"
+
+
+class OnnxEncoder:
+    """SentenceTransformer-compatible encoder running on ONNX Runtime
+
+    model_name is a Hugging Face repo or a local directory laid out like one
+    (onnx/model.onnx, tokenizer.json, and optionally the sentence-transformers
+    pooling and module configs). With quantize, the float model is quantized
+    to int8 weights once and cached under cache_dir.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Optional[Path] = None,
+        quantize: bool = True,
+        num_threads: Optional[int] = None,
+    ):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise RuntimeError(
+                "ONNX backend needs onnxruntime and tokenizers. "
+                "Install with: pip install 'memory-agent[onnx]'"
+            )
+
+        self.model_name = model_name
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        model_path = self._fetch(ONNX_FILE)
+        if quantize:
+            model_path = self._quantized(model_path)
+
+        sbert_config = self._fetch_json(SBERT_CONFIG_FILE) or {}
+        tokenizer_config = self._fetch_json(TOKENIZER_CONFIG_FILE) or {}
+        pooling = self._fetch_json(POOLING_FILE) or {}
+        modules = self._fetch_json(MODULES_FILE) or []
+        # Same precedence as sentence-transformers: its own limit, else the tokenizer's
+        self.max_seq_length = sbert_config.get(
+            "max_seq_length", min(tokenizer_config.get("model_max_length", 512), 512)
+        )
+        self.pooling = "cls" if pooling.get("pooling_mode_cls_token") else "mean"
+        self.normalize = any(module["type"].endswith("Normalize") for module in modules)
+
+        self.tokenizer = Tokenizer.from_file(str(self._fetch(TOKENIZER_FILE)))
+        self.tokenizer.enable_truncation(self.max_seq_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        """Embed one text or a list of texts, like SentenceTransformer.encode"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # Batching texts of similar length keeps padding to a minimum
+        order = np.argsort([-len(text) for text in sentences], kind="stable")
+        embeddings = np.empty((len(sentences), self.get_sentence_embedding_dimension()), "float32")
+        for start in range(0, len(sentences), batch_size):
+            batch = order[start : start + batch_size]
+            embeddings[batch] = self._encode_batch([sentences[i] for i in batch])
+
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Embedding dimension, read from the model's output shape"""
+        return self.session.get_outputs()[0].shape[-1]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Tokenize, run the model and pool one padded batch"""
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype="int64")
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype="int64")
+
+        token_embeddings = self.session.run(None, inputs)[0]
+        if self.pooling == "cls":
+            pooled = token_embeddings[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype("float32")
+            pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+        if self.normalize:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+    def _quantized(self, model_path: Path) -> Path:
+        """Dynamically quantize the model to int8 weights, once"""
+        target_dir = self.cache_dir / "onnx" if self.cache_dir else model_path.parent
+        target = target_dir / f"{self.model_name.strip('/').replace('/', '__')}.qint8.onnx"
+        if not target.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(".tmp")
+            quantize_dynamic(str(model_path), str(tmp), weight_type=QuantType.QInt8)
+            tmp.rename(target)
+        return target
+
+    def _fetch(self, filename: str) -> Path:
+        """Local path of a model file, downloading it from the hub if needed"""
+        local = Path(self.model_name)
+        if local.is_dir():
+            path = local / filename
+            if not path.exists():
+                raise FileNotFoundError(path)
+            return path
+
+        from huggingface_hub import hf_hub_download
+        from huggingface_hub.utils import EntryNotFoundError
+
+        try:
+            return Path(hf_hub_download(self.model_name, filename))
+        except EntryNotFoundError:
+            raise FileNotFoundError(f"{self.model_name} has no {filename}")
+
+    def _fetch_json(self, filename: str) -> Optional[Union[dict, list]]:
+        """Parse an optional JSON model file, or None if the model has none"""
+        try:
+            path = self._fetch(filename)
+        except FileNotFoundError:
+            return None
+        with open(path) as f:
+            return json.load(f)
@@ -0,0 +1,399 @@
+"""
+Vector store split into independent shards, searched in parallel
+Each shard is a full VectorStore (index, metadata, WAL) in its own directory
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .metadata_store import _chunks
+from .metrics import Metrics
+from .vector_store import METRICS, VectorStore, disk_size
+
+# How memories are assigned to shards
+SHARD_BY = ("hash", "time")
+
+# Leading characters of an ISO timestamp naming each time bucket
+TIME_BUCKETS = {"year": 4, "month": 7, "day": 10}
+
+# Shard of rows stored without a timestamp, in time-sharded stores
+UNDATED = "undated"
+
+ROUTES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    id TEXT PRIMARY KEY,
+    shard TEXT NOT NULL,
+    parent TEXT
+);
+CREATE INDEX IF NOT EXISTS routes_parent ON routes (parent);
+"""
+
+
+def holds_unsharded_store(data_dir: Path) -> bool:
+    """Whether data_dir already holds a single, unsharded VectorStore"""
+    return (data_dir / "faiss.index").exists() or (data_dir / "wal.log").exists()
+
+
+class ShardedVectorStore:
+    """VectorStore interface over shards under data_dir/shards
+
+    With shard_by "hash", a memory lives in shard crc32(id) % n_shards;
+    with "time", in the shard of its timestamp's time_bucket ("2026-10" for
+    "month"), and a routing table (shards.db) maps IDs to shards. Chunk rows
+    follow their parent either way. The layout is fixed when the store is
+    created and recorded in shards.json.
+
+    Shards are opened on first use, so a time-sharded store only loads the
+    buckets a query's since/until range covers. Searches fan out over the
+    shards on a thread pool (FAISS releases the GIL while searching) and
+    results are merged by score. Vector scores are comparable across shards;
+    BM25 scores only approximately, since each shard has its own statistics.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        shard_by: str = "hash",
+        n_shards: int = 8,
+        time_bucket: str = "month",
+        workers: Optional[int] = None,
+        metrics: Optional[Metrics] = None,
+        **store_options,
+    ):
+        self.data_dir = Path(data_dir)
+        self.shards_dir = self.data_dir / "shards"
+        self.manifest_path = self.data_dir / "shards.json"
+        self.routes_path = self.data_dir / "shards.db"
+
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            shard_by, n_shards, time_bucket = (
+                manifest["shard_by"],
+                manifest["n_shards"],
+                manifest["time_bucket"],
+            )
+        elif holds_unsharded_store(self.data_dir):
+            raise ValueError(
+                f"{self.data_dir} holds an unsharded store; sharding applies to new data "
+                "directories"
+            )
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"Unknown shard_by {shard_by!r}, expected one of {SHARD_BY}")
+        if time_bucket not in TIME_BUCKETS:
+            raise ValueError(
+                f"Unknown time bucket {time_bucket!r}, expected one of {list(TIME_BUCKETS)}"
+            )
+
+        self.shard_by = shard_by
+        self.n_shards = n_shards
+        self.time_bucket = time_bucket
+        self.metrics = metrics or Metrics()
+        self.store_options = store_options
+        self.index_factory = store_options.get("index_factory", "Flat")
+
+        self.shards_dir.mkdir(parents=True, exist_ok=True)
+        if not self.manifest_path.exists():
+            with open(self.manifest_path, "w") as f:
+                json.dump(
+                    {"shard_by": shard_by, "n_shards": n_shards, "time_bucket": time_bucket}, f
+                )
+
+        # Open shards by name; a shard's lock is held while it is being opened
+        self.shards: Dict[str, VectorStore] = {}
+        self.open_locks: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or min(32, os.cpu_count() or 1), thread_name_prefix="shard"
+        )
+
+        self.routes = None
+        if shard_by == "time":
+            self.routes = sqlite3.connect(str(self.routes_path), check_same_thread=False)
+            self.routes.execute("PRAGMA journal_mode=WAL")
+            self.routes.executescript(ROUTES_SCHEMA)
+
+    def add(self, id: str, vector: np.ndarray, metadata: dict):
+        """Add a vector with metadata"""
+        self.add_batch([id], vector.reshape(1, -1), [metadata])
+
+    def add_batch(self, ids: List[str], vectors: np.ndarray, metadatas: List[dict]):
+        """Add many vectors, one add_batch per shard they fall in"""
+        if not ids:
+            return
+        names = [self._shard_of(id, metadata) for id, metadata in zip(ids, metadatas)]
+
+        if self.routes is not None:
+            # A re-added memory may fall in another time bucket now; drop the old copy
+            parents = [id for id, m in zip(ids, metadatas) if not m.get("parent")]
+            current = self._locate(parents)
+            for id, name in zip(ids, names):
+                if id in current and current[id] != name:
+                    self._shard(current[id]).delete(id)
+            with self.lock:
+                # Chunk routes are rewritten along with their memory
+                self.routes.executemany(
+                    "DELETE FROM routes WHERE parent = ?", [(id,) for id in parents]
+                )
+                self.routes.executemany(
+                    "INSERT OR REPLACE INTO routes (id, shard, parent) VALUES (?, ?, ?)",
+                    [(id, name, m.get("parent")) for id, name, m in zip(ids, names, metadatas)],
+                )
+                self.routes.commit()
+
+        groups: Dict[str, List[int]] = {}
+        for i, name in enumerate(names):
+            groups.setdefault(name, []).append(i)
+        for name, rows in groups.items():
+            self._shard(name).add_batch(
+                [ids[i] for i in rows], vectors[rows], [metadatas[i] for i in rows]
+            )
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 10,
+        min_score: Optional[float] = None,
+        filters: Optional[dict] = None,
+    ) -> List[dict]:
+        """Search the shards that can hold matches in parallel, like VectorStore.search"""
+        results = self._fan_out(
+            self._candidate_shards(filters),
+            lambda shard: shard.search(query_vector, top_k, min_score=min_score, filters=filters),
+        )
+        return heapq.nlargest(top_k, chain.from_iterable(results), key=lambda r: r["score"])
+
+    def search_text(
+        self, query: str, top_k: int = 10, filters: Optional[dict] = None
+    ) -> List[dict]:
+        """Full-text (BM25) search of the shards in parallel, like VectorStore.search_text"""
+        results = self._fan_out(
+            self._candidate_shards(filters),
+            lambda shard: shard.search_text(query, top_k, filters=filters),
+        )
+        return heapq.nlargest(top_k, chain.from_iterable(results), key=lambda r: r["score"])
+
+    def recent(self, limit: int = 10, filters: Optional[dict] = None) -> List[dict]:
+        """Newest memories matching the filters"""
+
+        def newest(rows):
+            return heapq.nlargest(limit, rows, key=lambda r: r["metadata"].get("timestamp", ""))
+
+        names = self._candidate_shards(filters)
+        if self.shard_by == "hash":
+            results = self._fan_out(names, lambda shard: shard.recent(limit, filters))
+            return newest(chain.from_iterable(results))
+
+        # Time buckets hold disjoint ranges, so newer buckets are read first until
+        # enough, and undated rows sort oldest, as an empty timestamp does
+        rows: List[dict] = []
+        dated = sorted((name for name in names if name != UNDATED), reverse=True)
+        for name in dated + [name for name in names if name == UNDATED]:
+            rows += self._shard(name).recent(limit - len(rows), filters)
+            if len(rows) >= limit:
+                break
+        return newest(rows)
+
+    def get(self, id: str) -> Optional[dict]:
+        """Get a vector by ID"""
+        shard = self._existing_shard(id)
+        return shard.get(id) if shard else None
+
+    def get_vector(self, id: str) -> Optional[np.ndarray]:
+        """Stored vector of an ID, see VectorStore.get_vector"""
+        shard = self._existing_shard(id)
+        return shard.get_vector(id) if shard else None
+
+    def delete(self, id: str):
+        """Delete a vector and its metadata, along with any chunks of it"""
+        shard = self._existing_shard(id)
+        if shard is None:
+            return
+        shard.delete(id)
+        if self.routes is not None:
+            with self.lock:
+                self.routes.execute("DELETE FROM routes WHERE id = ? OR parent = ?", (id, id))
+                self.routes.commit()
+
+    def count(self) -> int:
+        """Count total vectors across shards, chunks included"""
+        return sum(self._fan_out(self._shard_names(), lambda shard: shard.count()))
+
+    def count_memories(self) -> int:
+        """Count memories across shards, not their extra chunks"""
+        if self.routes is not None:
+            # Answered without opening cold shards
+            with self.lock:
+                return self.routes.execute(
+                    "SELECT COUNT(*) FROM routes WHERE parent IS NULL"
+                ).fetchone()[0]
+        return sum(self._fan_out(self._shard_names(), lambda shard: shard.count_memories()))
+
+    def disk_usage(self) -> Dict[str, int]:
+        """Bytes on disk per store file, summed over shards, plus the routing table"""
+        usage: Dict[str, int] = {}
+        for shard_usage in self._fan_out(self._shard_names(), lambda shard: shard.disk_usage()):
+            for name, size in shard_usage.items():
+                usage[name] = usage.get(name, 0) + size
+        if self.routes is not None:
+            usage["shards.db"] = disk_size(self.routes_path)
+        return usage
+
+    def close(self):
+        """Close every open shard and the routing table"""
+        self.executor.shutdown()
+        with self.lock:
+            for shard in self.shards.values():
+                shard.close()
+            self.shards = {}
+            if self.routes is not None:
+                self.routes.close()
+                self.routes = None
+
+    def checkpoint(self):
+        """Checkpoint every open shard"""
+        self._fan_out(list(self.shards), lambda shard: shard.checkpoint())
+
+    def rebuild(self, index_factory: Optional[str] = None, metric: Optional[str] = None):
+        """Rebuild every shard's index, optionally changing its type or metric"""
+        if index_factory is not None:
+            self.index_factory = index_factory
+            self.store_options["index_factory"] = index_factory
+        if metric is not None:
+            if metric not in METRICS:
+                raise ValueError(f"Unknown metric {metric!r}, expected one of {sorted(METRICS)}")
+            # Shards created later start with the new metric too
+            self.store_options["metric"] = metric
+        self._fan_out(
+            self._shard_names(), lambda shard: shard.rebuild(index_factory, metric=metric)
+        )
+
+    def compact(self):
+        """Rebuild every shard's index without tombstoned vectors"""
+        self.rebuild()
+
+    def reembed(
+        self,
+        embed: Callable[[List[dict]], np.ndarray],
+        dimension: int,
+        batch_size: int = 1024,
+    ) -> int:
+        """Re-embed every shard in turn, see VectorStore.reembed"""
+        self.store_options["dimension"] = dimension
+        return sum(
+            self._shard(name).reembed(embed, dimension, batch_size=batch_size)
+            for name in self._shard_names()
+        )
+
+    def evaluate(self, k: int = 10, n_queries: int = 100, seed: int = 0) -> dict:
+        """Recall@k and query latency of each shard's index, averaged over shards
+
+        Merged results are exact when every shard's top k is, so per-shard
+        recall, weighted by shard size, stands in for the whole store's.
+        """
+        reports = [
+            report
+            for report in self._fan_out(
+                self._shard_names(), lambda shard: shard.evaluate(k, n_queries, seed)
+            )
+            if report["vectors"]
+        ]
+        report = {
+            "index": ", ".join(sorted({r["index"] for r in reports})) or self.index_factory,
+            "metric": reports[0]["metric"] if reports else self.store_options.get("metric", "l2"),
+            "vectors": sum(r["vectors"] for r in reports),
+            "k": k,
+            "shards": len(reports),
+        }
+        if reports:
+            weights = [r["vectors"] for r in reports]
+            for key in ("recall", "avg_query_ms", "exact_query_ms"):
+                report[key] = float(np.average([r[key] for r in reports], weights=weights))
+            report["p95_query_ms"] = max(r["p95_query_ms"] for r in reports)
+        return report
+
+    def _shard_of(self, id: str, metadata: dict) -> str:
+        """Name of the shard a row belongs to"""
+        if self.shard_by == "hash":
+            # Chunk rows ("<id>#<n>") follow their memory, also when looked up by ID alone
+            root = metadata.get("parent") or id.split("#", 1)[0]
+            return f"{zlib.crc32(root.encode()) % self.n_shards:03d}"
+        timestamp = metadata.get("timestamp")
+        return timestamp[: TIME_BUCKETS[self.time_bucket]] if timestamp else UNDATED
+
+    def _locate(self, ids: List[str]) -> Dict[str, str]:
+        """Shards of the given IDs, for IDs a time-sharded store holds"""
+        found = {}
+        with self.lock:
+            for batch in _chunks(ids):
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    self.routes.execute(
+                        f"SELECT id, shard FROM routes WHERE id IN ({placeholders})", batch
+                    ).fetchall()
+                )
+        return found
+
+    def _existing_shard(self, id: str) -> Optional[VectorStore]:
+        """Open shard that holds, or would hold, an ID, if that shard exists"""
+        if self.routes is not None:
+            name = self._locate([id]).get(id)
+        else:
+            name = self._shard_of(id, {})
+        if name is None or not (self.shards_dir / name).exists():
+            return None
+        return self._shard(name)
+
+    def _shard_names(self) -> List[str]:
+        """Names of all shards on disk"""
+        return sorted(path.name for path in self.shards_dir.iterdir() if path.is_dir())
+
+    def _candidate_shards(self, filters: Optional[dict]) -> List[str]:
+        """Shards that can hold memories matching the filters' time range"""
+        names = self._shard_names()
+        if self.shard_by != "time" or not filters:
+            return names
+        since, until = filters.get("since"), filters.get("until")
+        length = TIME_BUCKETS[self.time_bucket]
+        return [
+            name
+            for name in names
+            if name == UNDATED
+            or (
+                (since is None or name >= since[:length])
+                and (until is None or name <= until[:length])
+            )
+        ]
+
+    def _shard(self, name: str) -> VectorStore:
+        """Shard by name, opening (and creating) it on first use"""
+        shard = self.shards.get(name)
+        if shard is not None:
+            return shard
+        with self.lock:
+            lock = self.open_locks.setdefault(name, threading.Lock())
+        # Shards open concurrently, but each only once
+        with lock:
+            if name not in self.shards:
+                self.shards[name] = VectorStore(
+                    data_dir=str(self.shards_dir / name),
+                    metrics=self.metrics,
+                    **self.store_options,
+                )
+        return self.shards[name]
+
+    def _fan_out(self, names: List[str], call: Callable[[VectorStore], object]) -> list:
+        """call on each named shard, in parallel, in names order"""
+        if len(names) <= 1:
+            return [call(self._shard(name)) for name in names]
+        return list(self.executor.map(lambda name: call(self._shard(name)), names))
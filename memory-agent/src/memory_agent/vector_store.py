@@ -3,33 +3,158 @@ Vector store wrapper for Lance/FAISS
 Initial implementation using FAISS for simplicity
 """
 
+import base64
 import json
+import os
+import re
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Set
 
 import faiss
 import numpy as np
 
+from .metadata_store import MetadataStore
+from .metrics import Metrics
+
+# Supported similarity metrics and the FAISS metric each index is built with
+METRICS = {
+    "l2": faiss.METRIC_L2,
+    "ip": faiss.METRIC_INNER_PRODUCT,
+    "cosine": faiss.METRIC_INNER_PRODUCT,
+}
+
+# Filtered searches matching at most this many memories are scored exactly
+# against just those vectors instead of traversing the index
+EXACT_FILTER_MAX = 4096
+
+# Index types holding lossy (scalar or product quantized) vectors, for which
+# full-precision copies are kept to rerank candidates exactly
+LOSSY_INDEX = re.compile(r"SQ|PQ|RQ|LSH|RaBitQ")
+
 
 class VectorStore:
-    """Vector database wrapper using FAISS"""
+    """Vector database wrapper using FAISS
+
+    Writes go to an append-only write-ahead log (wal.log) and are applied to
+    the in-memory index and the SQLite metadata store (metadata.db); the full
+    index snapshot is only rewritten by checkpoint(), which runs automatically
+    once the log outgrows the snapshot.
+
+    The index type is any FAISS index_factory string ("Flat", "HNSW32,Flat",
+    "IVF1024,Flat", "IVF1024,PQ32", ...). Index types that need training are
+    served from a flat index until index_train_size vectors exist, then
+    trained and swapped in.
+
+    Deletes remove vectors from the index where the index type supports it.
+    Otherwise (HNSW) the label is tombstoned and excluded at search time, and
+    the index is compacted once tombstones exceed tombstone_ratio.
+
+    The metric ("l2", "ip" or "cosine") is fixed when the store is created
+    and only changed by rebuild(). Cosine stores normalize vectors once at
+    insert and search an inner-product index, so scores are true cosine
+    similarities; l2 scores are 1 / (1 + distance).
+
+    Quantized index types ("SQfp16", "SQ8", "IVF1024,SQ8", "PQ32", ...) hold
+    vectors in 2-16x less memory but score them approximately. With
+    rerank_candidates, such stores also keep each vector in full precision
+    in vectors.f32 (one row per label, memory-mapped, so it costs disk rather
+    than RAM): searches fetch that many candidates from the index and rescore
+    them exactly, and get_vector() and rebuilds use the exact vectors.
+
+    Searches can be filtered on tags and timestamp ranges. Matching labels
+    come from the metadata store's indexes and restrict the FAISS search
+    through an ID selector, so filtered-out memories never take top-k slots.
+
+    Long memories may be stored as a parent row plus chunk rows whose
+    metadata names the parent (see MemoryManager). Chunks are searched like
+    any other vector; deleting or replacing a parent drops its chunks.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        dimension: int = 384,
+        wal_checkpoint_bytes: int = 4 * 1024 * 1024,
+        index_factory: str = "Flat",
+        index_search_params: str = "",
+        index_train_size: int = 10000,
+        tombstone_ratio: float = 0.1,
+        metric: str = "l2",
+        metrics: Optional[Metrics] = None,
+        rerank_candidates: int = 100,
+    ):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {sorted(METRICS)}")
 
-    def __init__(self, data_dir: str, dimension: int = 384):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.dimension = dimension
+        self.wal_checkpoint_bytes = wal_checkpoint_bytes
+        self.index_factory = index_factory
+        self.index_search_params = index_search_params
+        self.index_train_size = index_train_size
+        self.tombstone_ratio = tombstone_ratio
+        self.metric = metric
+        self.rerank_candidates = rerank_candidates
+        # Latency of index searches and metadata hydration
+        self.metrics = metrics or Metrics()
 
         self.index_path = self.data_dir / "faiss.index"
-        self.metadata_path = self.data_dir / "metadata.json"
+        self.metadata_path = self.data_dir / "metadata.db"
+        self.legacy_metadata_path = self.data_dir / "metadata.json"
+        self.id_map_path = self.data_dir / "id_map.json"
+        self.wal_path = self.data_dir / "wal.log"
+        self.raw_path = self.data_dir / "vectors.f32"
+
+        # Next unused FAISS int64 label; metadata rows are keyed by label
+        self.next_label = 0
+        # Labels deleted from metadata but still present in the index
+        self.tombstones: Set[int] = set()
+        # Log sequence number of the last applied WAL record
+        self.lsn = 0
+        # Factory string the live index was actually built from
+        self.active_factory = "Flat"
+        # Full-precision vectors file and its read-only memory map, when kept
+        self.raw_file = None
+        self.raw_map: Optional[np.memmap] = None
+
+        self.metadata_store = MetadataStore(self.metadata_path)
+        migrating = self.legacy_metadata_path.exists()
+        if migrating:
+            self.metadata_store.import_json(self.legacy_metadata_path)
 
         # Initialize or load index
         if self.index_path.exists():
             self.index = faiss.read_index(str(self.index_path))
-            with open(self.metadata_path) as f:
-                self.metadata_store = json.load(f)
+            self.dimension = self.index.d
+            self._load_id_map()
         else:
-            self.index = faiss.IndexFlatL2(dimension)
-            self.metadata_store = {}
+            self.index = self._new_index(index_factory)
+            if self.index.is_trained:
+                self.active_factory = index_factory
+            else:
+                self.index = self._new_index("Flat")
+
+        backfill = self._keeps_raw() and not self.raw_path.exists()
+        if self._keeps_raw():
+            self._open_raw()
+        self._replay_wal()
+        if backfill:
+            # Reranking switched on for an existing store: the index's copies are all there is
+            labels = self.metadata_store.labels()
+            if len(labels):
+                self._write_raw(labels, self.index.reconstruct_batch(labels))
+
+        if migrating:
+            self._drop_orphans()
+            self.checkpoint()
+            self.legacy_metadata_path.rename(
+                self.legacy_metadata_path.with_suffix(".json.migrated")
+            )
+
+        self._maybe_train()
+        self._apply_search_params()
 
     def add(self, id: str, vector: np.ndarray, metadata: dict):
         """Add a vector with metadata"""
@@ -37,64 +162,729 @@ class VectorStore:
         if vector.ndim == 1:
             vector = vector.reshape(1, -1)
 
-        # Add to FAISS index
-        self.index.add(vector.astype("float32"))
+        self.add_batch([id], vector, [metadata])
+
+    def add_batch(self, ids: List[str], vectors: np.ndarray, metadatas: List[dict]):
+        """Add many vectors with one WAL fsync and one index insert"""
+        if not ids:
+            return
+        vectors = vectors.astype("float32")
+        if self.metric == "cosine":
+            faiss.normalize_L2(vectors)
+
+        # Add to FAISS index under fresh int64 labels
+        labels = list(range(self.next_label, self.next_label + len(ids)))
+
+        # Re-adding an existing ID replaces it; the WAL records which label it replaced
+        replaces = self._replaced_labels(ids, labels)
+        # Chunks of replaced memories that this batch does not re-add go with them
+        added = set(ids)
+        self._delete_labels(
+            {
+                id: label
+                for id, label in self.metadata_store.children_of(ids).items()
+                if id not in added
+            },
+            maintain=False,
+        )
+
+        self._log(
+            [
+                {
+                    "op": "add",
+                    "id": id,
+                    "label": label,
+                    "replaces": replaced,
+                    "vector": _encode(vector),
+                    "metadata": metadata,
+                }
+                for id, label, replaced, vector, metadata in zip(
+                    ids, labels, replaces, vectors, metadatas
+                )
+            ]
+        )
+        self._apply_add(ids, labels, vectors, metadatas, replaces)
 
-        # Store metadata with index position
-        position = self.index.ntotal - 1
-        self.metadata_store[id] = {"position": position, "metadata": metadata}
+        if not self._maybe_train():
+            self._maybe_checkpoint()
 
-        self._save()
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 10,
+        min_score: Optional[float] = None,
+        filters: Optional[dict] = None,
+    ) -> List[dict]:
+        """Search for similar vectors, optionally dropping hits scored below min_score
 
-    def search(self, query_vector: np.ndarray, top_k: int = 10) -> List[dict]:
-        """Search for similar vectors"""
+        filters may hold "tags" (all must match), "since" and "until" (ISO
+        timestamps, until exclusive).
+        """
         if self.index.ntotal == 0:
             return []
 
         # Ensure query vector is correct shape
         if query_vector.ndim == 1:
             query_vector = query_vector.reshape(1, -1)
+        query_vector = query_vector.astype("float32")
+        if self.metric == "cosine":
+            faiss.normalize_L2(query_vector)
 
-        # Search FAISS index
-        distances, indices = self.index.search(
-            query_vector.astype("float32"), min(top_k, self.index.ntotal)
-        )
+        with self.metrics.timer("index_search"):
+            allowed = None
+            if filters:
+                allowed = self.metadata_store.filter_labels(**filters)
+                if len(allowed) == 0:
+                    return []
+
+            if allowed is not None and len(allowed) <= EXACT_FILTER_MAX:
+                distances, labels = self._search_subset(query_vector, allowed, top_k)
+            else:
+                distances, labels = self._index_search(
+                    query_vector, top_k, self._search_params(allowed)
+                )
+
+        # Hydrate metadata for just these hits
+        with self.metrics.timer("hydrate"):
+            hits = self.metadata_store.get_by_labels(
+                [int(label) for label in labels[0] if label >= 0]
+            )
 
         # Build results
         results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            # Find metadata by position
-            for mem_id, data in self.metadata_store.items():
-                if data["position"] == idx:
-                    results.append(
-                        {
-                            "id": mem_id,
-                            "score": float(1.0 / (1.0 + dist)),  # Convert distance to similarity
-                            "metadata": data["metadata"],
-                        }
-                    )
-                    break
+        for dist, label in zip(distances[0], labels[0]):
+            if label not in hits:
+                continue
+            mem_id, metadata = hits[label]
+            score = self._score(dist)
+            # Hits come back best first, so nothing after this can pass either
+            if min_score is not None and score < min_score:
+                break
+            results.append(
+                {
+                    "id": mem_id,
+                    "score": score,
+                    "metadata": metadata,
+                }
+            )
 
         return results
 
+    def search_text(
+        self, query: str, top_k: int = 10, filters: Optional[dict] = None
+    ) -> List[dict]:
+        """Full-text (BM25) search of memory content, filtered like search()
+
+        Scores are BM25 relevance, higher is better, and not comparable with
+        vector similarities.
+        """
+        with self.metrics.timer("lexical_search"):
+            rows = self.metadata_store.search_text(query, top_k, **(filters or {}))
+        return [{"id": id, "score": score, "metadata": metadata} for _, id, metadata, score in rows]
+
+    def recent(self, limit: int = 10, filters: Optional[dict] = None) -> List[dict]:
+        """Newest memories matching the filters"""
+        rows = self.metadata_store.recent(limit, **(filters or {}))
+        return [{"id": id, "metadata": metadata} for id, metadata in rows]
+
     def get(self, id: str) -> Optional[dict]:
         """Get a vector by ID"""
-        if id in self.metadata_store:
-            return self.metadata_store[id]
-        return None
+        return self.metadata_store.get(id)
+
+    def get_vector(self, id: str) -> Optional[np.ndarray]:
+        """Reconstruct a stored vector
+
+        Cosine stores return the normalized vector; PQ/SQ indexes return
+        their lossy approximation unless full-precision vectors are kept.
+        """
+        label = self.metadata_store.labels_of([id]).get(id)
+        if label is None:
+            return None
+        return self._stored_vectors(np.array([label], dtype="int64"))[0]
 
     def delete(self, id: str):
-        """Delete a vector (soft delete - marks as deleted)"""
-        if id in self.metadata_store:
-            del self.metadata_store[id]
-            self._save()
+        """Delete a vector and its metadata, along with any chunks of it"""
+        found = self.metadata_store.labels_of([id])
+        if id in found:
+            found.update(self.metadata_store.children_of([id]))
+        self._delete_labels(found)
 
     def count(self) -> int:
-        """Count total vectors"""
-        return len(self.metadata_store)
-
-    def _save(self):
-        """Save index and metadata to disk"""
-        faiss.write_index(self.index, str(self.index_path))
-        with open(self.metadata_path, "w") as f:
-            json.dump(self.metadata_store, f, indent=2)
+        """Count total vectors, chunks included"""
+        return self.index.ntotal - len(self.tombstones)
+
+    def count_memories(self) -> int:
+        """Count memories, not their extra chunks"""
+        return self.metadata_store.count_memories()
+
+    def disk_usage(self) -> Dict[str, int]:
+        """Bytes on disk of the index snapshot, metadata database, WAL and exact vectors"""
+        usage = {}
+        paths = (self.index_path, self.metadata_path, self.id_map_path, self.wal_path)
+        for path in paths + (self.raw_path,):
+            usage[path.name] = disk_size(path)
+        return usage
+
+    def close(self):
+        """Close the metadata database and the full-precision vectors file"""
+        self.metadata_store.close()
+        self._close_raw()
+
+    def rebuild(self, index_factory: Optional[str] = None, metric: Optional[str] = None):
+        """Rebuild the index from the live vectors, optionally changing its type or metric"""
+        if index_factory is not None:
+            self.index_factory = index_factory
+
+        labels, vectors = self._live_vectors()
+        if metric is not None:
+            if metric not in METRICS:
+                raise ValueError(f"Unknown metric {metric!r}, expected one of {sorted(METRICS)}")
+            self.metric = metric
+            if metric == "cosine":
+                faiss.normalize_L2(vectors)
+        self._reset_raw(labels, vectors)
+        self.tombstones = set()
+        index = self._new_index(self.index_factory)
+        factory = self.index_factory
+        if not index.is_trained:
+            if len(labels) >= self._train_size(index):
+                index.train(vectors)
+            else:
+                # Too few vectors to train yet; _maybe_train() retries on later adds
+                index = self._new_index("Flat")
+                factory = "Flat"
+
+        if len(labels):
+            index.add_with_ids(vectors, labels)
+        self.index = index
+        self.active_factory = factory
+        self._apply_search_params()
+
+        self.checkpoint()
+
+    def reembed(
+        self,
+        embed: Callable[[List[dict]], np.ndarray],
+        dimension: int,
+        batch_size: int = 1024,
+    ) -> int:
+        """Replace every stored vector with embed(metadatas), e.g. after switching models
+
+        Memories are streamed from the metadata store into a fresh index under
+        their existing labels, so metadata is untouched. The live index keeps
+        serving until the new one is complete and swapped in by a checkpoint;
+        writes made meanwhile by other processes are lost. Returns the number
+        of memories re-embedded.
+        """
+        index = faiss.IndexIDMap2(faiss.IndexFlat(dimension, METRICS[self.metric]))
+        for rows in self.metadata_store.scan(batch_size):
+            labels = np.array([label for label, _ in rows], dtype="int64")
+            vectors = np.ascontiguousarray(embed([metadata for _, metadata in rows]), "float32")
+            if self.metric == "cosine":
+                faiss.normalize_L2(vectors)
+            index.add_with_ids(vectors, labels)
+
+        self.index = index
+        self.dimension = dimension
+        self.active_factory = "Flat"
+        self.tombstones = set()
+        # Kept vectors are of the old model; rebuild() rewrites them from the new index
+        self._drop_raw()
+        if self.index_factory == "Flat":
+            self.checkpoint()
+        else:
+            # Builds (and trains) the configured index type from the flat one
+            self.rebuild()
+        return index.ntotal
+
+    def compact(self):
+        """Rebuild the index without tombstoned vectors"""
+        self.rebuild()
+
+    def evaluate(self, k: int = 10, n_queries: int = 100, seed: int = 0) -> dict:
+        """Measure recall@k and query latency of the live index against exact search
+
+        Stored vectors are sampled as queries and searched both through the
+        index and by brute force.
+        """
+        labels, vectors = self._live_vectors()
+        report = {
+            "index": self.active_factory,
+            "metric": self.metric,
+            "vectors": len(labels),
+            "k": k,
+        }
+        if not len(labels):
+            return report
+
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(labels), size=min(n_queries, len(labels)), replace=False)
+        queries = vectors[sample]
+
+        start = time.perf_counter()
+        _, exact = faiss.knn(queries, vectors, min(k, len(labels)), metric=self.index.metric_type)
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        timings = []
+        hits = 0
+        for query, truth in zip(queries, labels[exact]):
+            start = time.perf_counter()
+            _, found = self._index_search(query.reshape(1, -1), k, self._search_params())
+            timings.append((time.perf_counter() - start) * 1000)
+            hits += len(set(found[0]) & set(truth))
+
+        report.update(
+            {
+                "recall": hits / exact.size,
+                "avg_query_ms": float(np.mean(timings)),
+                "p95_query_ms": float(np.percentile(timings, 95)),
+                "exact_query_ms": exact_ms,
+                "rerank_candidates": self.rerank_candidates if self._reranks() else 0,
+            }
+        )
+        return report
+
+    def _new_index(self, factory: str):
+        """Create an empty index that accepts our int64 labels"""
+        index = faiss.index_factory(self.dimension, factory, METRICS[self.metric])
+        try:
+            ivf = faiss.extract_index_ivf(index)
+        except RuntimeError:
+            # Flat, HNSW, SQ, ... are positional; map labels with IDMap2
+            return faiss.IndexIDMap2(index)
+
+        # IVF indexes store ids natively; a hashtable direct map keeps them reconstructable
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+
+    def _train_size(self, index) -> int:
+        """Minimum vectors to train an index
+
+        FAISS wants ~39 per IVF centroid. Each product sub-quantizer learns its
+        2**nbits centroids from all training vectors, so PQ needs at least
+        2**nbits of them; scalar quantizers enough to spread over each
+        dimension's 2**bits levels.
+        """
+        size = self.index_train_size
+        try:
+            size = max(size, 39 * faiss.extract_index_ivf(index).nlist)
+        except RuntimeError:
+            pass
+        for part in _index_parts(index):
+            if hasattr(part, "pq"):
+                size = max(size, part.pq.ksub)
+            elif hasattr(part, "sq") and not part.is_trained:
+                size = max(size, 2**part.sq.bits)
+        return size
+
+    def _maybe_train(self) -> bool:
+        """Train and swap in the configured index once enough vectors exist"""
+        if self.active_factory == self.index_factory:
+            return False
+        target = self._new_index(self.index_factory)
+        if target.is_trained or self.count() < self._train_size(target):
+            return False
+        self.rebuild()
+        return True
+
+    def _score(self, distance: float) -> float:
+        """Convert a FAISS distance into a similarity score"""
+        if self.metric == "l2":
+            return float(1.0 / (1.0 + distance))
+        return float(distance)
+
+    def _maybe_compact(self) -> bool:
+        """Compact once tombstones make up too much of the index"""
+        if len(self.tombstones) <= self.tombstone_ratio * max(self.index.ntotal, 1):
+            return False
+        self.compact()
+        return True
+
+    def _search_params(
+        self, allowed: Optional[np.ndarray] = None
+    ) -> Optional[faiss.SearchParameters]:
+        """Search parameters restricting hits to allowed labels or excluding tombstones"""
+        if allowed is not None:
+            # Allowed labels come from the metadata store, so tombstones are already excluded
+            batch = faiss.IDSelectorBatch(allowed)
+            params = self._selector_params(batch)
+            params.referenced_objects = [batch]
+            return params
+        if not self.tombstones:
+            return None
+        tombstones = np.fromiter(self.tombstones, dtype="int64", count=len(self.tombstones))
+        batch = faiss.IDSelectorBatch(tombstones)
+        selector = faiss.IDSelectorNot(batch)
+        params = self._selector_params(selector)
+        # SWIG does not keep the wrapped selectors alive on its own
+        params.referenced_objects = [batch, selector]
+        return params
+
+    def _selector_params(self, selector: faiss.IDSelector) -> faiss.SearchParameters:
+        """Search parameters of the live index's type, with its current tuning and a selector
+
+        IVF indexes reject plain SearchParameters, and typed ones replace the
+        index's own nprobe/efSearch, so those are carried over.
+        """
+        try:
+            ivf = faiss.extract_index_ivf(self.index)
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        except RuntimeError:
+            pass
+        inner = self.index.index if isinstance(self.index, faiss.IndexIDMap2) else self.index
+        inner = faiss.downcast_index(inner)
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=inner.hnsw.efSearch)
+        return faiss.SearchParameters(sel=selector)
+
+    def _index_search(
+        self, query_vector: np.ndarray, top_k: int, params: Optional[faiss.SearchParameters]
+    ):
+        """Search the index, rescoring a quantized index's candidates exactly when reranking"""
+        if not self._reranks():
+            return self.index.search(query_vector, min(top_k, self.index.ntotal), params=params)
+
+        n_candidates = min(max(top_k, self.rerank_candidates), self.index.ntotal)
+        _, candidates = self.index.search(query_vector, n_candidates, params=params)
+        candidates = candidates[0][candidates[0] >= 0]
+        if not len(candidates):
+            return np.empty((1, 0), dtype="float32"), np.empty((1, 0), dtype="int64")
+        return self._search_subset(query_vector, candidates, top_k)
+
+    def _search_subset(self, query_vector: np.ndarray, labels: np.ndarray, top_k: int):
+        """Exact search over a small set of labels, shaped like index.search output"""
+        vectors = self._stored_vectors(labels)
+        distances, positions = faiss.knn(
+            query_vector, vectors, min(top_k, len(labels)), metric=self.index.metric_type
+        )
+        return distances, np.where(positions >= 0, labels[positions], -1)
+
+    def _apply_search_params(self):
+        """Apply search-time parameters (nprobe, efSearch, ...) to the live index"""
+        if self.index_search_params and self.active_factory == self.index_factory:
+            faiss.ParameterSpace().set_index_parameters(self.index, self.index_search_params)
+
+    def _live_vectors(self):
+        """Labels and vectors of all non-deleted entries"""
+        labels = self.metadata_store.labels()
+        if not len(labels):
+            return labels, np.empty((0, self.dimension), dtype="float32")
+        return labels, self._stored_vectors(labels)
+
+    def _stored_vectors(self, labels: np.ndarray) -> np.ndarray:
+        """Vectors of labels, full precision when kept, else reconstructed from the index"""
+        if self.raw_file is None:
+            return self.index.reconstruct_batch(labels)
+        rows = os.fstat(self.raw_file.fileno()).st_size // (self.dimension * 4)
+        if self.raw_map is None or len(self.raw_map) < rows:
+            # Remapped as the file grows
+            self.raw_map = np.memmap(
+                self.raw_path, dtype="float32", mode="r", shape=(rows, self.dimension)
+            )
+        return np.asarray(self.raw_map[labels])
+
+    def _keeps_raw(self) -> bool:
+        """Whether the configured index type calls for full-precision vectors"""
+        return self.rerank_candidates > 0 and bool(LOSSY_INDEX.search(self.index_factory))
+
+    def _reranks(self) -> bool:
+        """Whether searches of the live index are reranked"""
+        return self.raw_file is not None and bool(LOSSY_INDEX.search(self.active_factory))
+
+    def _open_raw(self):
+        """Open (creating if needed) the full-precision vectors file"""
+        self.raw_file = open(self.raw_path, "r+b" if self.raw_path.exists() else "w+b")
+
+    def _close_raw(self):
+        """Close the full-precision vectors file and its memory map"""
+        self.raw_map = None
+        if self.raw_file is not None:
+            self.raw_file.close()
+            self.raw_file = None
+
+    def _drop_raw(self):
+        """Close and delete the full-precision vectors file"""
+        self._close_raw()
+        if self.raw_path.exists():
+            self.raw_path.unlink()
+
+    def _reset_raw(self, labels: np.ndarray, vectors: np.ndarray):
+        """Replace the full-precision vectors with the given ones, if they are kept"""
+        self._drop_raw()
+        if self._keeps_raw():
+            self._open_raw()
+            if len(labels):
+                self._write_raw(labels, vectors)
+
+    def _write_raw(self, labels, vectors: np.ndarray):
+        """Write full-precision vectors into their labels' rows"""
+        labels = np.asarray(labels, dtype="int64")
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        # One write per run of consecutive labels, which is all of a batch of adds
+        breaks = np.flatnonzero(np.diff(labels) != 1) + 1
+        for run, rows in zip(np.split(labels, breaks), np.split(vectors, breaks)):
+            self.raw_file.seek(int(run[0]) * self.dimension * 4)
+            self.raw_file.write(rows.tobytes())
+        self.raw_file.flush()
+
+    def _load_id_map(self):
+        """Load index state saved at the last checkpoint, migrating older stores"""
+        if self.id_map_path.exists():
+            with open(self.id_map_path) as f:
+                data = json.load(f)
+            self.next_label = data["next_label"]
+            self.lsn = data.get("lsn", 0)
+            self.active_factory = data.get("index_factory", "Flat")
+            self.metric = data.get("metric", "l2")
+            tombstones = data.get("tombstones", [])
+            if tombstones:
+                # A crash mid-checkpoint can pair a compacted index with the previous
+                # id map, whose tombstones are then no longer in the index
+                tombstones = np.intersect1d(tombstones, self._index_labels()).tolist()
+            self.tombstones = set(tombstones)
+        elif not isinstance(self.index, faiss.IndexIDMap2):
+            self.metric = "l2"
+            self._migrate_positional_index()
+        else:
+            self.metric = "l2"
+            self.next_label = int(self._index_labels().max(initial=-1)) + 1
+
+    def _migrate_positional_index(self):
+        """Wrap a plain positional index in an ID map, using positions as labels"""
+        ntotal = self.index.ntotal
+        vectors = self.index.reconstruct_n(0, ntotal) if ntotal else None
+
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.index.d))
+        if ntotal:
+            self.index.add_with_ids(vectors, np.arange(ntotal, dtype="int64"))
+        self.next_label = ntotal
+
+    def _index_labels(self) -> np.ndarray:
+        """All labels held by the index, including tombstones"""
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return faiss.vector_to_array(self.index.id_map)
+
+        invlists = faiss.extract_index_ivf(self.index).invlists
+        return np.concatenate(
+            [np.empty(0, dtype="int64")]
+            + [
+                faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+                for i in range(invlists.nlist)
+            ]
+        )
+
+    def _drop_orphans(self):
+        """Remove vectors that older stores left in the index after soft deletes"""
+        orphans = np.setdiff1d(self._index_labels(), self.metadata_store.labels())
+        self._remove_labels([int(label) for label in orphans if label not in self.tombstones])
+
+    def _apply_add(
+        self,
+        ids: List[str],
+        labels: List[int],
+        vectors: np.ndarray,
+        metadatas: List[dict],
+        replaces: List[Optional[int]],
+    ):
+        """Apply a batch of adds to the index and metadata store"""
+        self.index.add_with_ids(vectors, np.array(labels, dtype="int64"))
+        if self.raw_file is not None:
+            self._write_raw(labels, vectors)
+        self.metadata_store.put_many(zip(labels, ids, metadatas))
+        self._remove_labels([label for label in replaces if label is not None])
+        self.metadata_store.commit()
+
+        self.next_label = max(self.next_label, labels[-1] + 1)
+
+    def _delete_labels(self, found: Dict[str, int], maintain: bool = True):
+        """Log and apply deletes of the given ID -> label rows
+
+        With maintain, compaction or a checkpoint follows if due; callers
+        about to log more records pass False and maintain afterwards.
+        """
+        if not found:
+            return
+        self._log([{"op": "delete", "id": id, "label": label} for id, label in found.items()])
+        for label in found.values():
+            self._apply_delete(label)
+        if maintain and not self._maybe_compact():
+            self._maybe_checkpoint()
+
+    def _apply_delete(self, label: int):
+        """Apply a delete to the index and metadata store"""
+        self.metadata_store.delete_labels([label])
+        self._remove_labels([label])
+        self.metadata_store.commit()
+
+    def _remove_labels(self, labels: List[int]):
+        """Remove vectors from the index, tombstoning them if it cannot remove"""
+        if not labels:
+            return
+        try:
+            self.index.remove_ids(np.array(labels, dtype="int64"))
+        except RuntimeError:
+            # e.g. HNSW graphs do not support removal
+            self.tombstones.update(labels)
+
+    def _log(self, records: List[dict]):
+        """Append records to the write-ahead log and fsync once for the batch"""
+        lines = []
+        for record in records:
+            self.lsn += 1
+            record["lsn"] = self.lsn
+            lines.append(json.dumps(record, separators=(",", ":")) + "\n")
+
+        with open(self.wal_path, "a") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay_wal(self):
+        """Apply WAL records written since the last checkpoint"""
+        if not self.wal_path.exists():
+            return
+
+        # A crash between checkpoint()'s two swaps leaves a snapshot newer than
+        # the id map's LSN, so adds of labels it already holds are not re-added
+        indexed = self._index_labels()
+        indexed = indexed[indexed >= self.next_label]
+
+        valid_bytes = 0
+        pending: List[dict] = []
+        with open(self.wal_path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash mid-append; drop the tail
+                    break
+                valid_bytes += len(line)
+
+                if record["lsn"] <= self.lsn:
+                    continue
+                self.lsn = record["lsn"]
+
+                # Consecutive adds are applied to the index in one call
+                if record["op"] == "add":
+                    pending.append(record)
+                    continue
+                self._apply_add_records(pending, indexed)
+                pending = []
+                if record["op"] == "delete":
+                    label = record.get("label")
+                    if label is None:
+                        # Records from before labels were logged
+                        label = self.metadata_store.labels_of([record["id"]]).get(record["id"])
+                    if label is not None:
+                        self._apply_delete(label)
+        self._apply_add_records(pending, indexed)
+
+        if valid_bytes < self.wal_path.stat().st_size:
+            os.truncate(self.wal_path, valid_bytes)
+
+    def _apply_add_records(self, records: List[dict], indexed: np.ndarray):
+        """Apply replayed WAL add records, skipping labels the index already holds"""
+        if not records:
+            return
+        ids = [r["id"] for r in records]
+        labels = [r["label"] for r in records]
+        if all("replaces" in r for r in records):
+            replaces = [r["replaces"] for r in records]
+        else:
+            # Records from before replaced labels were logged
+            replaces = self._replaced_labels(ids, labels)
+
+        held = np.isin(labels, indexed)
+        if held.any():
+            # Their metadata is committed already, but replaced labels may only have
+            # been tombstoned, and tombstones are saved with the id map
+            self._remove_labels([r for r, h in zip(replaces, held) if h and r is not None])
+            self.next_label = max(self.next_label, labels[-1] + 1)
+            records = [r for r, h in zip(records, held) if not h]
+            if not records:
+                return
+            ids = [r["id"] for r in records]
+            labels = [r["label"] for r in records]
+            replaces = [r for r, h in zip(replaces, held) if not h]
+
+        self._apply_add(
+            ids,
+            labels,
+            np.stack([_decode(r["vector"]) for r in records]),
+            [r["metadata"] for r in records],
+            replaces,
+        )
+
+    def _replaced_labels(self, ids: List[str], labels: List[int]) -> List[Optional[int]]:
+        """Label each added ID currently has, accounting for repeats within the batch"""
+        current = self.metadata_store.labels_of(ids)
+        replaces = []
+        for id, label in zip(ids, labels):
+            replaces.append(current.get(id))
+            current[id] = label
+        return replaces
+
+    def _maybe_checkpoint(self):
+        """Checkpoint once the WAL outgrows the snapshot it extends"""
+        wal_size = self.wal_path.stat().st_size
+        snapshot_size = self.index_path.stat().st_size if self.index_path.exists() else 0
+        if wal_size > max(self.wal_checkpoint_bytes, snapshot_size):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Write a full snapshot of the index, then truncate the WAL"""
+        index_tmp = self.index_path.with_suffix(".index.tmp")
+        faiss.write_index(self.index, str(index_tmp))
+        self.metadata_store.commit()
+        if self.raw_file is not None:
+            # Rows written since the last checkpoint are only durable in the WAL until now
+            os.fsync(self.raw_file.fileno())
+
+        id_map_tmp = self.id_map_path.with_suffix(".json.tmp")
+        with open(id_map_tmp, "w") as f:
+            json.dump(
+                {
+                    "next_label": self.next_label,
+                    "lsn": self.lsn,
+                    "index_factory": self.active_factory,
+                    "metric": self.metric,
+                    "tombstones": sorted(self.tombstones),
+                },
+                f,
+            )
+
+        # The id map carries the checkpoint LSN, so it is swapped in last; if a
+        # crash comes between the swaps, replay skips adds the snapshot holds
+        os.replace(index_tmp, self.index_path)
+        os.replace(id_map_tmp, self.id_map_path)
+
+        if self.wal_path.exists():
+            os.truncate(self.wal_path, 0)
+
+
+def disk_size(path: Path) -> int:
+    """Bytes on disk of a file, with the -wal and -shm files SQLite keeps recent writes in"""
+    related = [path, Path(f"{path}-wal"), Path(f"{path}-shm")]
+    return sum(p.stat().st_size for p in related if p.exists())
+
+
+def _index_parts(index) -> Iterator:
+    """An index and the indexes it wraps, downcast to their concrete types"""
+    while index is not None:
+        index = faiss.downcast_index(index)
+        yield index
+        if isinstance(index, faiss.IndexHNSW):
+            index = index.storage
+        else:
+            # IDMap2 and pre-transform wrappers; None for leaf indexes
+            index = getattr(index, "index", None)
+
+
+def _encode(vector: np.ndarray) -> str:
+    """Encode a float32 vector for a WAL record"""
+    return base64.b64encode(vector.astype("float32").tobytes()).decode("ascii")
+
+
+def _decode(data: str) -> np.ndarray:
+    """Decode a float32 vector from a WAL record"""
+    return np.frombuffer(base64.b64decode(data), dtype="float32")
@@ -0,0 +1,36 @@
+"""
+Test chunking of long memories
+"""
+
+from memory_agent.chunking import chunk_text
+
+
+def test_short_text_is_one_chunk():
+    """Test text within the budget comes back unchanged"""
+    assert chunk_text("One short sentence.", max_tokens=10) == ["One short sentence."]
+
+
+def test_chunks_respect_budget_and_overlap():
+    """Test chunks stay within budget, break on sentences and overlap"""
+    text = " ".join(f"Sentence number {i} has six words." for i in range(20))
+
+    chunks = chunk_text(text, max_tokens=20, overlap=6)
+
+    assert len(chunks) > 1
+    assert all(len(chunk.split()) <= 20 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # The last sentence of each chunk opens the next one
+        assert chunk.startswith(previous.split(". ")[-1])
+    assert "Sentence number 19 has six words." in chunks[-1]
+
+
+def test_paragraphs_and_long_sentences():
+    """Test paragraph breaks are kept and run-on sentences split on words"""
+    text = "First paragraph here.\n\nSecond paragraph here. " + "word " * 25
+
+    chunks = chunk_text(text, max_tokens=10, overlap=0)
+
+    assert chunks[0] == "First paragraph here.\n\nSecond paragraph here."
+    assert all(len(chunk.split()) <= 10 for chunk in chunks)
+    assert sum(chunk.count("word") for chunk in chunks) == 25
@@ -2,12 +2,21 @@
 Test CLI interface
 """
 
+import subprocess
+import sys
+
 from typer.testing import CliRunner
 
+from memory_agent import cli
 from memory_agent.cli import app
 
 runner = CliRunner()
 
+# Modules that must stay out of the CLI's import path
+HEAVY_MODULES = {"torch", "sentence_transformers", "transformers", "faiss", "numpy"}
+# Generous cold-import budget for memory_agent.cli, in microseconds
+IMPORT_BUDGET_US = 1_500_000
+
 
 def test_add_command():
     """Test add command"""
@@ -16,6 +25,55 @@ def test_add_command():
     assert "Memory saved" in result.stdout
 
 
+def test_import_command(tmp_path, monkeypatch):
+    """Test import streams JSONL lines and Markdown files"""
+    (tmp_path / "notes.jsonl").write_text(
+        '{"content": "a", "tags": ["x"]}\n\n{"content": "b"}\n{"content": "c", "tags": null}\n'
+    )
+    (tmp_path / "note.md").write_text("# Title\nbody")
+    imported = []
+
+    class StubManager:
+        def add_memories(self, items, batch_size):
+            imported.extend(items)
+            return len(imported)
+
+    monkeypatch.setattr(cli, "_manager", StubManager())
+    result = runner.invoke(app, ["import", str(tmp_path), "--tag", "backfill"])
+
+    assert result.exit_code == 0
+    assert "Imported 4 memories" in result.stdout
+    assert [r["content"] for r in imported] == ["# Title\nbody", "a", "b", "c"]
+    assert imported[1]["tags"] == ["x", "backfill"]
+    assert imported[3]["tags"] == ["backfill"]
+
+
+def test_ask_reports_errors_mid_stream(monkeypatch):
+    """Test an LLM failure part way through a streamed answer falls back to search"""
+
+    def pieces():
+        yield "The answer"
+        raise RuntimeError("connection reset")
+
+    class Result:
+        memory = type("Memory", (), {"content": "A relevant memory"})
+
+    class StubManager:
+        def ask_stream(self, question):
+            return ["mem_1"], pieces()
+
+        def search(self, query, limit):
+            return [Result()]
+
+    monkeypatch.setattr(cli, "_manager", StubManager())
+    result = runner.invoke(app, ["ask", "What happened?"])
+
+    assert result.exit_code == 0
+    assert "The answer" in result.stdout
+    assert "LLM failed while answering: connection reset" in result.stdout
+    assert "A relevant memory" in result.stdout
+
+
 def test_search_command():
     """Test search command"""
     result = runner.invoke(app, ["search", "test query"])
@@ -33,3 +91,23 @@ def test_setup_command():
     """Test setup command"""
     result = runner.invoke(app, ["setup"])
     assert result.exit_code == 0
+
+
+def test_cli_import_is_lightweight():
+    """Test importing the CLI stays under budget and skips heavy modules"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import memory_agent.cli"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines look like "import time:  self [us] | cumulative | <indent>module"
+    timings = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                timings[module.strip()] = int(cumulative)
+
+    assert not HEAVY_MODULES & {module.split(".")[0] for module in timings}
+    assert timings["memory_agent.cli"] < IMPORT_BUDGET_US
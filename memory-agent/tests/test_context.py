@@ -0,0 +1,59 @@
+"""
+Test packing of search results into a prompt context
+"""
+
+from memory_agent.context import pack_context
+from memory_agent.models import Memory, SearchResult
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def results(*contents):
+    return [
+        SearchResult(memory=Memory(id=f"mem_{i}", content=c), score=1.0 - i / 10)
+        for i, c in enumerate(contents)
+    ]
+
+
+def test_packs_in_rank_order_within_budget():
+    """Test everything that fits is packed, numbered, with its token count"""
+    context, sources, tokens = pack_context(results("one two", "three four"), 100, count_words)
+
+    assert context == "[1] one two\n\n[2] three four"
+    assert sources == ["mem_0", "mem_1"]
+    assert tokens == 6
+
+
+def test_near_duplicates_are_dropped():
+    """Test a hit repeating a better one is left out"""
+    context, sources, _ = pack_context(
+        results("The deploy failed at noon.", "the deploy FAILED at noon", "Lunch was good."),
+        100,
+        count_words,
+    )
+
+    assert sources == ["mem_0", "mem_2"]
+    assert "[2] Lunch was good." in context
+
+
+def test_overflowing_memory_is_trimmed_on_sentences():
+    """Test the first memory that does not fit is cut to the remaining budget"""
+    long = " ".join(f"Sentence {i} is here." for i in range(40))
+    context, sources, tokens = pack_context(
+        results("short memory", long, "never reached"), 50, count_words
+    )
+
+    assert sources == ["mem_0", "mem_1"]
+    assert tokens <= 50
+    assert context.endswith(".")
+    assert "never reached" not in context
+
+
+def test_top_hit_is_always_included():
+    """Test a budget smaller than the best memory still gets a trimmed piece of it"""
+    _, sources, tokens = pack_context(results("a b c d e f g h i j"), 5, count_words)
+
+    assert sources == ["mem_0"]
+    assert tokens <= 5
@@ -0,0 +1,103 @@
+"""
+Test the memory daemon
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from memory_agent import daemon
+from memory_agent.models import Memory, SearchResult
+
+
+class StubManager:
+    """Records calls the daemon forwards"""
+
+    def __init__(self):
+        self.embeddings = SimpleNamespace(_load_model=lambda: None)
+        self.vector_store = SimpleNamespace(close=lambda: None)
+        self.memories = {}
+
+    def add_memory(self, content, tags=None, metadata=None):
+        memory = Memory(content=content, tags=tags or [], metadata=metadata or {})
+        self.memories[memory.id] = memory
+        return memory
+
+    def add_memories(self, items, batch_size=256):
+        return len(items)
+
+    def search(self, query, limit=10, filters=None, min_score=None, mode=None):
+        return [SearchResult(memory=m, score=0.5) for m in self.memories.values()][:limit]
+
+    def get_memory(self, memory_id, with_embedding=False):
+        return self.memories.get(memory_id)
+
+    def delete_memory(self, memory_id):
+        if memory_id not in self.memories:
+            raise KeyError(memory_id)
+        del self.memories[memory_id]
+
+    def ask_stream(self, question, top_k=5):
+        def pieces():
+            yield from question.split()
+            if question.endswith("?"):
+                raise ValueError("generation failed")
+
+        return list(self.memories)[:top_k], pieces()
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Serve a stub manager in a background thread and connect to it"""
+    path = tmp_path / "daemon.sock"
+    thread = threading.Thread(target=daemon.serve, args=(StubManager(), path), daemon=True)
+    thread.start()
+
+    for _ in range(100):
+        client = daemon.connect(path)
+        if client is not None:
+            break
+        time.sleep(0.01)
+    yield client
+    client.close()
+
+
+def test_connect_without_daemon(tmp_path):
+    """Test the CLI falls back when nothing is listening"""
+    assert daemon.connect(tmp_path / "daemon.sock") is None
+
+
+def test_round_trip(client):
+    """Test calls, models and errors survive the socket"""
+    memory = client.add_memory("hello", tags=["x"])
+    assert isinstance(memory, Memory)
+    assert client.get_memory(memory.id) == memory
+
+    results = client.search("hello", filters={"tags": ["x"]})
+    assert results == [SearchResult(memory=memory, score=0.5)]
+
+    assert client.add_memories(({"content": str(i)} for i in range(5)), batch_size=2) == 5
+
+    client.delete_memory(memory.id)
+    assert client.get_memory(memory.id) is None
+    with pytest.raises(KeyError):
+        client.delete_memory(memory.id)
+
+
+def test_streams_answers(client):
+    """Test streamed answers arrive piece by piece and errors end the stream"""
+    memory = client.add_memory("hello")
+
+    sources, pieces = client.ask_stream("streamed answer pieces")
+    assert sources == [memory.id]
+    assert list(pieces) == ["streamed", "answer", "pieces"]
+
+    _, pieces = client.ask_stream("will it fail?")
+    assert next(pieces) == "will"
+    with pytest.raises(ValueError):
+        list(pieces)
+
+    # The connection is still usable after a failed stream
+    assert client.get_memory(memory.id) == memory
@@ -2,10 +2,15 @@
 Test embedding engine
 """
 
+import asyncio
+import threading
+import time
+
 import numpy as np
 import pytest
 
-from memory_agent.embeddings import EmbeddingEngine
+from memory_agent.embedding_cache import EmbeddingCache
+from memory_agent.embeddings import EmbeddingBatcher, EmbeddingEngine
 
 
 @pytest.fixture
@@ -53,3 +58,149 @@ def test_similarity(engine):
     assert sim_similar > sim_different
     assert 0 <= sim_similar <= 1
     assert 0 <= sim_different <= 1
+
+
+def test_embedding_cache_is_lru_and_persistent(tmp_path):
+    """Test the cache evicts least recently used entries and survives reopening"""
+    path = tmp_path / "embedding_cache.db"
+    cache = EmbeddingCache(max_size=2, path=path)
+    cache.put("model", "first", np.ones(4))
+    cache.put("model", "second", np.zeros(4))
+    assert cache.get("model", "  first ") is not None
+    cache.put("model", "third", np.full(4, 2.0))
+
+    assert cache.get("model", "second") is None
+    assert cache.get("other-model", "first") is None
+    assert np.array_equal(cache.get("model", "third"), np.full(4, 2.0, dtype=np.float32))
+    cache.close()
+
+    reopened = EmbeddingCache(max_size=2, path=path)
+    assert np.array_equal(reopened.get("model", "first"), np.ones(4, dtype=np.float32))
+    assert reopened.get("model", "second") is None
+    assert reopened.stats() == {"hits": 3, "misses": 3, "size": 2}
+
+
+def test_embed_uses_cache():
+    """Test repeated embeds skip the model"""
+    engine = EmbeddingEngine()
+    calls = []
+
+    class StubModel:
+        def encode(self, text, convert_to_numpy=True):
+            calls.append(text)
+            return np.ones(4, dtype=np.float32)
+
+    engine.model = StubModel()
+    engine.embed("cached sentence")
+    engine.embed("cached  sentence")
+
+    assert calls == ["cached sentence"]
+    assert engine.cache_stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    # Write-path embeds neither read nor fill the cache
+    engine.embed("cached sentence", cache=False)
+    engine.embed("stored document", cache=False)
+    assert calls == ["cached sentence", "cached sentence", "stored document"]
+    assert engine.cache_stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_onnx_backend_matches_torch(engine, tmp_path):
+    """Test the int8 ONNX backend embeds close to the torch model"""
+    pytest.importorskip("onnxruntime")
+    onnx_engine = EmbeddingEngine(backend="onnx", cache_size=0, models_dir=tmp_path)
+    texts = [
+        "The cat sat on the mat",
+        "Python is a programming language",
+        "Dentist appointment scheduled for March 15 at 2pm " * 20,
+    ]
+
+    expected = engine.embed_batch(texts, show_progress=False)
+    actual = onnx_engine.embed_batch(texts, show_progress=False)
+
+    assert actual.shape == expected.shape
+    for torch_vector, onnx_vector in zip(expected, actual):
+        assert engine.similarity(torch_vector, onnx_vector) > 0.99
+
+
+class SlowStubModel:
+    """Stand-in model recording the batches it encodes"""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        self.batches.append(list(texts))
+        time.sleep(0.02)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_batcher_coalesces_concurrent_embeds():
+    """Test concurrent callers share forward passes and get their own results"""
+    engine = EmbeddingEngine(cache_size=0)
+    engine.model = SlowStubModel()
+    batcher = EmbeddingBatcher(engine)
+    results = {}
+
+    def call(n):
+        results[n] = batcher.embed("x" * n)
+
+    threads = [threading.Thread(target=call, args=(n,)) for n in range(1, 17)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert all(results[n][0] == n for n in range(1, 17))
+    assert len(engine.model.batches) < 16
+    assert sum(len(batch) for batch in engine.model.batches) == 16
+
+
+def test_batcher_serves_lone_and_async_callers():
+    """Test a lone call is encoded alone and async callers are batched too"""
+    engine = EmbeddingEngine()
+    engine.model = SlowStubModel()
+    batcher = EmbeddingBatcher(engine)
+
+    assert batcher.embed("abc")[0] == 3
+    assert engine.model.batches == [["abc"]]
+
+    async def gather():
+        return await asyncio.gather(*(batcher.embed_async(t) for t in ["a", "bb", "abc"]))
+
+    vectors = asyncio.run(gather())
+    batcher.close()
+
+    assert [v[0] for v in vectors] == [1, 2, 3]
+    assert ["abc"] not in engine.model.batches[1:]
+    assert batcher.cache_stats()["hits"] == 1
+
+    # Write-path embeds neither read nor fill the cache
+    batcher = EmbeddingBatcher(engine)
+    assert batcher.embed("abc", cache=False)[0] == 3
+    assert batcher.embed("document", cache=False)[0] == 8
+    batcher.close()
+    assert engine.model.batches[-2:] == [["abc"], ["document"]]
+    assert batcher.cache_stats() == {"hits": 1, "misses": 3, "size": 3}
+
+
+def test_hash_model_needs_no_download():
+    """Test hash:// models give stable unit vectors that share words' similarity"""
+    engine = EmbeddingEngine("hash://256", backend="onnx")
+    texts = ["The cat sat on the mat", "The cat is sitting on the mat", "Quarterly tax invoice"]
+
+    embeddings = engine.embed_batch(texts)
+    assert embeddings.shape == (3, 256) and engine.dimension == 256
+    assert embeddings.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_array_equal(engine.embed(texts[0]), embeddings[0])
+    np.testing.assert_array_equal(EmbeddingEngine("hash://256").embed(""), engine.embed(""))
+
+    assert engine.similarity(*embeddings[:2]) > engine.similarity(embeddings[0], embeddings[2])
+    assert engine.count_tokens("Hello, hash world") == 3
+    assert engine.cache is None
+    with engine.pool(workers=1) as pool:
+        assert pool.embed_batch([]).shape == (0, 256)
+
+    with pytest.raises(ValueError):
+        EmbeddingEngine("hash://many")
@@ -0,0 +1,85 @@
+"""
+Test the LLM interface
+"""
+
+from memory_agent.llm import ANSWER_TEMPLATE, LLMInterface
+
+
+class FakeLlama:
+    """llama-cpp stand-in streaming a fixed completion and tracking its KV cache"""
+
+    def __init__(self):
+        self.tokens = []
+        self.evaluated = 0
+        self.loads = 0
+
+    def tokenize(self, text, add_bos=True, special=False):
+        return list(text.decode("utf-8"))
+
+    def reset(self):
+        self.tokens = []
+
+    def eval(self, tokens):
+        self.evaluated += len(tokens)
+        self.tokens += tokens
+
+    def save_state(self):
+        return list(self.tokens)
+
+    def load_state(self, state):
+        self.loads += 1
+        self.tokens = list(state)
+
+    def __call__(self, prompt, max_tokens, temperature, stop, stream=False):
+        assert stream
+        # Like llama-cpp, only evaluate what the KV cache does not already hold
+        prompt = list(prompt)
+        shared = 0
+        while shared < min(len(prompt), len(self.tokens)) and prompt[shared] == self.tokens[shared]:
+            shared += 1
+        self.tokens = self.tokens[:shared]
+        self.eval(prompt[shared:])
+        for piece in [" ", " The", " answer", " is", " 42.", "\n"]:
+            yield {"choices": [{"text": piece}]}
+
+
+def llm_with(model):
+    """LLMInterface with a preloaded llama-cpp model"""
+    llm = LLMInterface()
+    llm.model = model
+    llm._backend_type = "llama-cpp"
+    return llm
+
+
+def test_generate_stream_yields_pieces():
+    """Test streamed pieces arrive in order, without leading whitespace"""
+    llm = llm_with(FakeLlama())
+
+    assert list(llm.answer_question_stream("What is it?", "[1] It is 42")) == [
+        "The",
+        " answer",
+        " is",
+        " 42.",
+        "\n",
+    ]
+    assert llm.generate("prompt") == "The answer is 42."
+
+
+def test_template_prefixes_are_evaluated_once():
+    """Test template prefixes are restored from saved state and timings are recorded"""
+    model = FakeLlama()
+    llm = llm_with(model)
+
+    llm.answer_question("First?", "[1] context")
+    assert llm.last_timings["prefix_cached"] is False
+    llm.summarize("Some text")
+
+    before = model.evaluated
+    llm.answer_question("Second?", "[1] context")
+    assert model.loads == 1
+    assert llm.last_timings["prefix_cached"] is True
+    assert set(llm.last_timings) == {"prompt_ms", "generate_ms", "pieces", "prefix_cached"}
+
+    # Only the text after the instructions was evaluated again
+    prompt = ANSWER_TEMPLATE.format(question="Second?", context="[1] context")
+    assert model.evaluated - before == len(prompt) - len(ANSWER_TEMPLATE.split("{")[0])
@@ -2,16 +2,24 @@
 Test memory manager
 """
 
+from datetime import datetime, timedelta
+
+import numpy as np
 import pytest
 
+from memory_agent.config import Config, EmbeddingConfig, StorageConfig
 from memory_agent.memory_manager import MemoryManager
+from memory_agent.sharded_store import ShardedVectorStore
 
 
 @pytest.fixture
-def manager():
-    """Create memory manager with test config"""
-    # TODO: Use test configuration
-    return MemoryManager()
+def manager(tmp_path):
+    """Create memory manager on a temporary store with the hashing embedder"""
+    config = Config(
+        embedding=EmbeddingConfig(model_name="hash://384"),
+        storage=StorageConfig(data_dir=tmp_path),
+    )
+    return MemoryManager(config)
 
 
 def test_add_memory(manager):
@@ -57,3 +65,217 @@ def test_delete_memory(manager):
     manager.delete_memory(memory.id)
 
     # TODO: Verify deletion after vector store is implemented
+
+
+def test_reembed_stops_previous_batcher(tmp_path):
+    """Test re-embedding a batching manager closes the engine it replaces"""
+    config = Config(
+        embedding=EmbeddingConfig(model_name="hash://384"),
+        storage=StorageConfig(data_dir=tmp_path),
+    )
+    manager = MemoryManager(config, batching=True)
+    memory = manager.add_memory("Batched embeds are coalesced", tags=["batching"])
+    previous = manager.embeddings
+
+    assert manager.reembed(workers=1) == 1
+    assert not previous.thread.is_alive()
+    assert manager.embeddings is not previous
+    assert manager.search("coalesced batched embeds", limit=1)[0].memory.id == memory.id
+    manager.embeddings.close()
+
+
+def test_add_memories_bulk(manager):
+    """Test bulk ingest from a lazy iterable of mixed items"""
+    items = (
+        {"content": f"note {i}", "tags": ["bulk"]} if i % 2 else f"note {i}" for i in range(10)
+    )
+
+    added = manager.add_memories(items, batch_size=4)
+
+    assert added == 10
+    assert manager.vector_store.count() == 10
+    top = manager.search("note 7", limit=1)[0].memory
+    assert top.content == "note 7"
+    assert top.tags == ["bulk"]
+
+
+def test_reindex_reports_recall(manager):
+    """Test reindexing into an ANN index and reporting its quality"""
+    # Varied texts, since "note <i>" alone hashes every pair equally far apart
+    rng = np.random.default_rng(0)
+    words = [f"word{i}" for i in range(50)]
+    manager.add_memories((" ".join(rng.choice(words, 6)) for _ in range(200)), batch_size=64)
+
+    report = manager.reindex("HNSW16,Flat", eval_queries=20)
+
+    assert report["index"] == "HNSW16,Flat"
+    assert report["vectors"] == 200
+    assert report["recall"] > 0.8
+
+
+def test_embeddings_are_not_stored_in_metadata(manager):
+    """Test metadata omits embeddings and get_memory reconstructs them on request"""
+    memory = manager.add_memory("Vectors live in the index")
+
+    stored = manager.vector_store.get(memory.id)["metadata"]
+    assert "embedding" not in stored
+    assert manager.get_memory(memory.id).embedding is None
+
+    restored = manager.get_memory(memory.id, with_embedding=True)
+    assert np.allclose(restored.embedding, memory.embedding)
+
+
+def test_search_and_list_honour_filters(manager):
+    """Test tag and time filters on search and list"""
+    manager.add_memory("Python is a programming language", tags=["tech"])
+    manager.add_memory("I love cooking pasta", tags=["food"])
+    manager.add_memory("Rust is a programming language", tags=["tech", "rust"])
+
+    results = manager.search("pasta", filters={"tags": "tech"})
+    assert {r.memory.content for r in results} == {
+        "Python is a programming language",
+        "Rust is a programming language",
+    }
+
+    recent = manager.list_memories(limit=5, filters={"tags": ["tech"]})
+    assert [m.content for m in recent] == [
+        "Rust is a programming language",
+        "Python is a programming language",
+    ]
+    future = datetime.now() + timedelta(days=1)
+    assert manager.search("pasta", filters={"since": future}) == []
+
+    with pytest.raises(ValueError):
+        manager.search("pasta", filters={"author": "me"})
+
+
+def test_long_memories_are_chunked(manager):
+    """Test long memories are found through later chunks and deleted with them"""
+    manager.config.embedding.chunk_tokens = 20
+    manager.config.embedding.chunk_overlap = 0
+    sentences = [f"Sentence number {i} has six words." for i in range(10)]
+    memory = manager.add_memory(" ".join(sentences), tags=["long"])
+    manager.add_memories(["Short memory", " ".join(reversed(sentences))])
+
+    assert manager.vector_store.count() > 3
+    assert manager.vector_store.count_memories() == 3
+    assert [m.id for m in manager.list_memories(filters={"tags": ["long"]})] == [memory.id]
+
+    # Chunks hold three sentences each, leaving the last one on its own
+    results = manager.search(sentences[-1], limit=1)
+    assert results[0].memory.id == memory.id
+    assert results[0].memory.content == memory.content
+    assert results[0].score == 1.0
+
+    # Chunk IDs resolve to their memory
+    by_chunk = manager.get_memory(f"{memory.id}#1", with_embedding=True)
+    assert by_chunk.id == memory.id and by_chunk.content == memory.content
+    full = manager.get_memory(memory.id, with_embedding=True)
+    assert by_chunk.embedding == full.embedding
+
+    manager.delete_memory(memory.id)
+    assert manager.vector_store.count_memories() == 2
+    assert not manager.vector_store.metadata_store.children_of([memory.id])
+
+
+@pytest.mark.parametrize("fusion", ["rrf", "weighted"])
+def test_hybrid_search_finds_exact_identifiers(manager, fusion):
+    """Test lexical and hybrid modes find identifiers the embeddings miss"""
+    manager.config.search.fusion = fusion
+    target = manager.add_memory("Pager fired for ERR-4312 on db-01.example.com")
+    manager.add_memories([f"Unrelated note {i}" for i in range(30)])
+
+    lexical = manager.search("ERR-4312", limit=3, mode="lexical")
+    assert [r.memory.id for r in lexical] == [target.id]
+
+    hybrid = manager.search("what happened on db-01.example.com", limit=3, mode="hybrid")
+    assert len(hybrid) == 3
+    assert hybrid[0].memory.id == target.id
+
+    with pytest.raises(ValueError):
+        manager.search("ERR-4312", mode="fuzzy")
+
+
+@pytest.mark.parametrize("shard_by", ["hash", "time"])
+def test_sharded_store(tmp_path, shard_by):
+    """Test the manager works the same over a sharded store, long memories included"""
+    config = Config(
+        embedding=EmbeddingConfig(model_name="hash://384", chunk_tokens=20, chunk_overlap=0),
+        storage=StorageConfig(data_dir=tmp_path, shard_by=shard_by, shards=3),
+    )
+    manager = MemoryManager(config)
+    long = " ".join(f"Sentence {i} is about gardening and roses." for i in range(20))
+    memory = manager.add_memory(long, tags=["garden"])
+    manager.add_memories([f"note {i} on cooking pasta" for i in range(10)])
+
+    assert manager.search("roses gardening", limit=1)[0].memory.id == memory.id
+    assert manager.search("roses", limit=1, mode="lexical")[0].memory.id == memory.id
+    assert manager.get_stats()["total_memories"] == 11
+    assert manager.get_memory(f"{memory.id}#1").id == memory.id
+
+    manager.delete_memory(memory.id)
+    assert manager.get_memory(memory.id) is None
+    assert manager.vector_store.count() == 10
+
+
+def test_existing_store_stays_unsharded(tmp_path, manager):
+    """Test turning on shard_by leaves a store created unsharded as it is"""
+    memory = manager.add_memory("Created before sharding was configured")
+    manager.vector_store.close()
+
+    config = Config(
+        embedding=EmbeddingConfig(model_name="hash://384"),
+        storage=StorageConfig(data_dir=tmp_path, shard_by="hash"),
+    )
+    reopened = MemoryManager(config)
+    assert not isinstance(reopened.vector_store, ShardedVectorStore)
+    assert reopened.get_memory(memory.id).content == memory.content
+
+
+def test_stats_report_storage_and_latency(manager):
+    """Test stats report file sizes and per-stage latencies"""
+    for i in range(5):
+        manager.add_memory(f"memory number {i}")
+    for _ in range(3):
+        manager.search("memory", limit=2)
+
+    stats = manager.get_stats()
+    assert stats["total_memories"] == 5
+    assert stats["storage"]["metadata.db"] > 0
+    assert stats["storage_used"] == sum(stats["storage"].values())
+
+    latency = stats["latency"]
+    assert latency["add_memory"]["count"] == 5
+    assert latency["search"]["count"] == 3
+    assert latency["embed"]["count"] == 8
+    assert latency["index_search"]["count"] == 3
+    assert stats["avg_query_time"] == latency["search"]["mean_ms"]
+
+
+class FakeLLM:
+    """LLMInterface stand-in that records the context it is given"""
+
+    last_timings = None
+
+    def count_tokens(self, text):
+        return len(text.split())
+
+    def answer_question(self, question, context):
+        self.context = context
+        return "answer"
+
+
+def test_ask_packs_context_into_budget(manager):
+    """Test ask keeps the prompt context within the configured budget"""
+    manager.llm = FakeLLM()
+    manager.config.llm.context_budget = 40
+    manager.config.search.mode = "lexical"
+    for i in range(5):
+        manager.add_memory(" ".join(["budget"] + [f"word{i}_{j}" for j in range(15)]))
+
+    result = manager.ask("budget")
+
+    assert result.answer == "answer"
+    assert result.context_tokens <= 40
+    assert 1 < len(result.sources) < 5
+    assert manager.llm.context.count("[") == len(result.sources)
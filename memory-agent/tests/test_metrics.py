@@ -0,0 +1,38 @@
+"""
+Test latency histograms
+"""
+
+import pytest
+
+from memory_agent.metrics import GROWTH, Metrics
+
+
+def test_percentiles_fall_in_recorded_buckets():
+    """Test percentiles land within one bucket of the recorded latencies"""
+    metrics = Metrics()
+    for ms in range(1, 101):
+        metrics.record("search", float(ms))
+    with metrics.timer("embed"):
+        pass
+
+    summary = metrics.summary()
+    assert set(summary) == {"embed", "search"}
+    search = summary["search"]
+    assert search["count"] == 100
+    assert search["mean_ms"] == pytest.approx(50.5)
+    for percentile in (50, 95, 99):
+        assert percentile / GROWTH <= search[f"p{percentile}_ms"] <= percentile * GROWTH
+    assert summary["embed"]["count"] == 1
+
+
+def test_persisted_histograms_accumulate(tmp_path):
+    """Test separate instances on the same file add to the same histograms"""
+    path = tmp_path / "metrics.db"
+    for ms in (2.0, 4.0):
+        metrics = Metrics(path, flush_interval=3600)
+        metrics.record("ask", ms)
+        metrics.close()
+
+    summary = Metrics(path).summary()
+    assert summary["ask"]["count"] == 2
+    assert summary["ask"]["mean_ms"] == pytest.approx(3.0)
@@ -0,0 +1,105 @@
+"""
+Test sharded vector store
+"""
+
+import numpy as np
+import pytest
+
+from memory_agent.sharded_store import ShardedVectorStore
+from memory_agent.vector_store import VectorStore
+
+DIM = 8
+
+
+def random_vectors(n, seed=0):
+    """Generate deterministic random vectors"""
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32)
+
+
+def test_hash_shards_search_like_one_store(tmp_path):
+    """Test fanned-out search over hash shards matches a single store"""
+    vectors = random_vectors(200)
+    ids = [f"mem_{i}" for i in range(200)]
+    metadatas = [{"n": i} for i in range(200)]
+    sharded = ShardedVectorStore(str(tmp_path / "sharded"), n_shards=4, dimension=DIM)
+    single = VectorStore(str(tmp_path / "single"), dimension=DIM)
+    for store in (sharded, single):
+        store.add_batch(ids, vectors, metadatas)
+
+    assert len(list((tmp_path / "sharded" / "shards").iterdir())) == 4
+    assert sharded.count() == sharded.count_memories() == 200
+    for query in random_vectors(10, seed=1):
+        expected = [(r["id"], r["score"]) for r in single.search(query, top_k=5)]
+        assert [(r["id"], r["score"]) for r in sharded.search(query, top_k=5)] == expected
+
+    # Chunks land in their parent's shard, so deletes cascade
+    sharded.add_batch(["mem_3#1"], random_vectors(1, seed=2), [{"parent": "mem_3"}])
+    sharded.delete("mem_3")
+    assert sharded.get("mem_3") is None and sharded.count() == 199
+    np.testing.assert_array_equal(sharded.get_vector("mem_4"), vectors[4])
+    sharded.close()
+
+    # The layout is kept on reopen, whatever is asked for
+    reopened = ShardedVectorStore(str(tmp_path / "sharded"), shard_by="time", dimension=DIM)
+    assert reopened.shard_by == "hash" and reopened.get("mem_5")["metadata"] == {"n": 5}
+
+
+def test_time_shards_load_only_queried_buckets(tmp_path):
+    """Test time shards are pruned by the filter range and opened lazily"""
+    months = ["2026-01", "2026-02", "2026-03"]
+    vectors = random_vectors(30)
+    metadatas = [{"timestamp": f"{months[i % 3]}-10T12:00:00", "n": i} for i in range(30)]
+    store = ShardedVectorStore(str(tmp_path), shard_by="time", dimension=DIM)
+    store.add_batch([f"mem_{i}" for i in range(30)], vectors, metadatas)
+    store.close()
+
+    store = ShardedVectorStore(str(tmp_path), dimension=DIM)
+    assert store.count_memories() == 30 and not store.shards
+
+    results = store.search(vectors[4], top_k=3, filters={"since": "2026-02-01T00:00:00"})
+    assert results[0]["id"] == "mem_4"
+    assert sorted(store.shards) == ["2026-02", "2026-03"]
+
+    assert [r["metadata"]["n"] for r in store.recent(2)] == [29, 26]
+    assert store.get("mem_0")["metadata"]["n"] == 0
+
+    # Re-adding with a new timestamp moves the memory to its new bucket
+    store.add("mem_0", vectors[0], {"timestamp": "2026-03-01T00:00:00", "n": 0})
+    assert store.shards["2026-01"].get("mem_0") is None
+    assert store.get("mem_0")["metadata"]["timestamp"].startswith("2026-03")
+    assert store.count_memories() == 30
+
+
+def test_time_shards_read_undated_last(tmp_path):
+    """Test recent() serves dated buckets newest first before the undated shard"""
+    vectors = random_vectors(4)
+    metadatas = [{"n": 0}, {"n": 1}, {"timestamp": "2026-01-10T12:00:00", "n": 2}]
+    metadatas.append({"timestamp": "2026-02-10T12:00:00", "n": 3})
+    store = ShardedVectorStore(str(tmp_path), shard_by="time", dimension=DIM)
+    store.add_batch([f"mem_{i}" for i in range(4)], vectors, metadatas)
+
+    assert [r["metadata"]["n"] for r in store.recent(2)] == [3, 2]
+    assert sorted(r["metadata"]["n"] for r in store.recent(4)) == [0, 1, 2, 3]
+
+
+def test_sharded_rebuild_and_disk_usage(tmp_path):
+    """Test a rebuilt metric reaches shards created afterwards, and usage sums shards"""
+    store = ShardedVectorStore(str(tmp_path), n_shards=4, dimension=DIM)
+    store.add_batch(["mem_0"], random_vectors(1), [{}])
+    store.rebuild(metric="ip")
+    store.add_batch([f"mem_{i}" for i in range(1, 20)], random_vectors(19, seed=1), [{}] * 19)
+    assert {shard.metric for shard in store.shards.values()} == {"ip"}
+    with pytest.raises(ValueError):
+        store.rebuild(metric="manhattan")
+
+    usage = store.disk_usage()
+    per_shard = [shard.disk_usage() for shard in store.shards.values()]
+    assert usage["wal.log"] == sum(u["wal.log"] for u in per_shard) > 0
+    assert usage["metadata.db"] == sum(u["metadata.db"] for u in per_shard)
+
+
+def test_sharding_refuses_unsharded_store(tmp_path):
+    """Test an existing single store is not silently shadowed by empty shards"""
+    VectorStore(str(tmp_path), dimension=DIM).add("mem_0", random_vectors(1)[0], {})
+    with pytest.raises(ValueError):
+        ShardedVectorStore(str(tmp_path), dimension=DIM)
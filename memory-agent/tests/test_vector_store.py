@@ -0,0 +1,546 @@
+"""
+Test vector store
+"""
+
+import base64
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pytest
+
+from memory_agent import vector_store
+from memory_agent.metadata_store import MetadataStore
+from memory_agent.vector_store import VectorStore
+
+DIM = 8
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Create vector store in a temporary directory"""
+    return VectorStore(data_dir=str(tmp_path), dimension=DIM)
+
+
+def random_vectors(n, seed=0):
+    """Generate deterministic random vectors"""
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32)
+
+
+def test_search_maps_labels_to_ids(store):
+    """Test search resolves FAISS labels back to memory IDs"""
+    vectors = random_vectors(5)
+    for i, vector in enumerate(vectors):
+        store.add(f"mem_{i}", vector, {"n": i})
+
+    results = store.search(vectors[3], top_k=1)
+
+    assert results[0]["id"] == "mem_3"
+    assert results[0]["metadata"] == {"n": 3}
+
+
+def test_deleted_ids_are_not_returned(store):
+    """Test deleted memories drop out of search results"""
+    vectors = random_vectors(3)
+    for i, vector in enumerate(vectors):
+        store.add(f"mem_{i}", vector, {})
+
+    store.delete("mem_1")
+    results = store.search(vectors[1], top_k=3)
+
+    assert "mem_1" not in [r["id"] for r in results]
+    assert store.count() == 2
+
+
+def test_reload_preserves_id_map(tmp_path):
+    """Test the reverse index survives a reload"""
+    vectors = random_vectors(4)
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+    for i, vector in enumerate(vectors):
+        store.add(f"mem_{i}", vector, {})
+    store.delete("mem_0")
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+    assert reloaded.get("mem_1")["label"] == 1
+    assert reloaded.get("mem_0") is None
+    assert reloaded.search(vectors[2], top_k=1)[0]["id"] == "mem_2"
+
+    reloaded.add("mem_new", vectors[0], {})
+    assert reloaded.get("mem_new")["label"] == 4
+
+
+def test_migrates_positional_store(tmp_path):
+    """Test stores written before the ID map are migrated on load"""
+    vectors = random_vectors(3)
+    index = faiss.IndexFlatL2(DIM)
+    index.add(vectors)
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+    # mem_1 was soft-deleted: its vector stayed in the index
+    metadata = {f"mem_{i}": {"position": i, "metadata": {"n": i}} for i in (0, 2)}
+    (tmp_path / "metadata.json").write_text(json.dumps(metadata))
+
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+
+    assert isinstance(store.index, faiss.IndexIDMap2)
+    assert store.search(vectors[2], top_k=1)[0]["metadata"] == {"n": 2}
+    assert store.count() == 2
+    assert (tmp_path / "id_map.json").exists()
+    assert (tmp_path / "metadata.db").exists()
+    assert not (tmp_path / "metadata.json").exists()
+
+
+def test_writes_go_to_wal_until_checkpoint(tmp_path):
+    """Test adds and deletes are replayed from the WAL on open"""
+    vectors = random_vectors(3)
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+    for i, vector in enumerate(vectors):
+        store.add(f"mem_{i}", vector, {"n": i})
+    store.delete("mem_0")
+
+    assert not (tmp_path / "faiss.index").exists()
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+    assert reloaded.count() == 2
+    assert reloaded.search(vectors[1], top_k=1)[0]["metadata"] == {"n": 1}
+
+    reloaded.checkpoint()
+    assert (tmp_path / "wal.log").stat().st_size == 0
+    assert VectorStore(data_dir=str(tmp_path), dimension=DIM).count() == 2
+
+
+@pytest.mark.parametrize("index_factory", ["Flat", "HNSW16,Flat"])
+def test_crash_between_checkpoint_swaps_does_not_duplicate(tmp_path, monkeypatch, index_factory):
+    """Test a new snapshot under the previous id map replays without re-adding vectors"""
+    vectors = random_vectors(5)
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM, index_factory=index_factory)
+    store.add_batch([f"mem_{i}" for i in range(4)], vectors[:4], [{"n": i} for i in range(4)])
+    store.add("mem_0", vectors[4], {"n": 4})
+    store.checkpoint()
+    store.add("mem_4", vectors[4], {"n": 4})
+    store.add("mem_1", vectors[0], {"n": 0})
+
+    replace = os.replace
+
+    def crash_on_id_map(src, dst):
+        if Path(dst).name == "id_map.json":
+            raise OSError("simulated crash")
+        replace(src, dst)
+
+    monkeypatch.setattr(vector_store.os, "replace", crash_on_id_map)
+    with pytest.raises(OSError):
+        store.checkpoint()
+    store.close()
+    monkeypatch.undo()
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM, index_factory=index_factory)
+    assert reloaded.count() == 5
+    results = reloaded.search(vectors[0], top_k=10)
+    assert sorted(r["id"] for r in results) == [f"mem_{i}" for i in range(5)]
+    assert results[0]["id"] == "mem_1"
+    assert reloaded.get("mem_0")["metadata"] == {"n": 4}
+
+    reloaded.add("mem_5", vectors[1], {})
+    assert len(reloaded.search(vectors[1], top_k=10)) == 6
+
+
+def test_crash_mid_compaction_drops_stale_tombstones(tmp_path, monkeypatch):
+    """Test tombstones the compacted index no longer holds are not subtracted from count"""
+    store = VectorStore(
+        data_dir=str(tmp_path), dimension=DIM, index_factory="HNSW16,Flat", tombstone_ratio=1.0
+    )
+    store.add_batch([f"mem_{i}" for i in range(5)], random_vectors(5), [{}] * 5)
+    store.delete("mem_0")
+    store.delete("mem_1")
+    store.checkpoint()
+    assert store.tombstones == {0, 1}
+
+    replace = os.replace
+
+    def crash_on_id_map(src, dst):
+        if Path(dst).name == "id_map.json":
+            raise OSError("simulated crash")
+        replace(src, dst)
+
+    monkeypatch.setattr(vector_store.os, "replace", crash_on_id_map)
+    with pytest.raises(OSError):
+        store.compact()
+    store.close()
+    monkeypatch.undo()
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM, index_factory="HNSW16,Flat")
+    assert reloaded.tombstones == set()
+    assert reloaded.count() == reloaded.index.ntotal == 3
+
+
+def test_torn_wal_tail_is_dropped(tmp_path):
+    """Test a partially written WAL record is ignored and truncated"""
+    vectors = random_vectors(2)
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+    store.add("mem_0", vectors[0], {})
+    with open(tmp_path / "wal.log", "a") as f:
+        f.write('{"op": "add", "id": "mem_1", "lab')
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+    reloaded.add("mem_1", vectors[1], {})
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+    assert reloaded.count() == 2
+    assert reloaded.get("mem_1") is not None
+
+
+def test_wal_checkpoints_automatically(tmp_path):
+    """Test the WAL is compacted into a snapshot once it grows too large"""
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM, wal_checkpoint_bytes=1024)
+    for i, vector in enumerate(random_vectors(20)):
+        store.add(f"mem_{i}", vector, {})
+
+    assert (tmp_path / "faiss.index").exists()
+    assert (tmp_path / "wal.log").stat().st_size <= 1024
+    assert VectorStore(data_dir=str(tmp_path), dimension=DIM).count() == 20
+
+
+def test_trainable_index_is_swapped_in_once_trained(tmp_path):
+    """Test an IVF store serves from a flat index until it can be trained"""
+    store = VectorStore(
+        data_dir=str(tmp_path), dimension=DIM, index_factory="IVF4,Flat", index_train_size=100
+    )
+    vectors = random_vectors(200)
+    store.add_batch([f"mem_{i}" for i in range(50)], vectors[:50], [{}] * 50)
+    assert store.active_factory == "Flat"
+
+    store.add_batch([f"mem_{i}" for i in range(50, 200)], vectors[50:], [{}] * 150)
+    assert store.active_factory == "IVF4,Flat"
+    assert store.index.ntotal == 200
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM, index_factory="IVF4,Flat")
+    assert reloaded.active_factory == "IVF4,Flat"
+    assert reloaded.search(vectors[123], top_k=1)[0]["id"] == "mem_123"
+
+
+@pytest.mark.parametrize(
+    "index_factory, needed",
+    [("PQ2x4", 16), ("HNSW16,PQ2x4", 16), ("IVF1,PQ2x6", 64), ("SQ4", 16)],
+)
+def test_quantizers_wait_for_enough_training_vectors(tmp_path, index_factory, needed):
+    """Test PQ and SQ indexes are not trained on fewer vectors than their codebooks need"""
+    store = VectorStore(
+        data_dir=str(tmp_path), dimension=DIM, index_factory=index_factory, index_train_size=10
+    )
+    vectors = random_vectors(needed)
+    store.add_batch([f"mem_{i}" for i in range(needed - 1)], vectors[:-1], [{}] * (needed - 1))
+    assert store.active_factory == "Flat"
+
+    store.add(f"mem_{needed - 1}", vectors[-1], {})
+    assert store.active_factory == index_factory
+    assert store.index.ntotal == needed
+
+
+def test_train_size_sees_through_wrapping_indexes(tmp_path):
+    """Test quantizers behind pre-transforms and IVF lists set the training minimum"""
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM, index_train_size=10)
+    assert store._train_size(faiss.index_factory(DIM, "OPQ4,IVF1,PQ4")) == 256
+    assert store._train_size(faiss.index_factory(DIM, "IVF512,SQ8")) == 39 * 512
+    assert store._train_size(faiss.index_factory(DIM, "SQfp16")) == 10
+
+
+def test_rebuild_switches_index_type(store):
+    """Test rebuild migrates the live vectors into a new index type"""
+    vectors = random_vectors(100)
+    store.add_batch([f"mem_{i}" for i in range(100)], vectors, [{}] * 100)
+    store.delete("mem_0")
+
+    store.rebuild("HNSW16,Flat")
+
+    assert store.active_factory == "HNSW16,Flat"
+    assert store.index.ntotal == 99
+    assert store.search(vectors[42], top_k=1)[0]["id"] == "mem_42"
+
+
+def test_quantized_store_reranks_with_exact_vectors(tmp_path):
+    """Test SQ stores rescore candidates against kept full-precision vectors"""
+    vectors = random_vectors(500)
+    ids = [f"mem_{i}" for i in range(500)]
+    queries = random_vectors(50, seed=2)
+    _, exact = faiss.knn(queries, vectors, 5)
+    recall = {}
+    for rerank in (0, 50):
+        store = VectorStore(
+            data_dir=str(tmp_path / str(rerank)),
+            dimension=DIM,
+            index_factory="SQ4",
+            index_train_size=100,
+            rerank_candidates=rerank,
+        )
+        store.add_batch(ids, vectors, [{}] * 500)
+        assert store.active_factory == "SQ4"
+        found = [[hit["id"] for hit in store.search(query, top_k=5)] for query in queries]
+        recall[rerank] = np.mean(
+            [f"mem_{i}" in hits for row, hits in zip(exact, found) for i in row]
+        )
+        store.close()
+
+    assert recall[0] < 1.0
+    assert recall[50] == 1.0
+    assert not (tmp_path / "0" / "vectors.f32").exists()
+
+    reloaded = VectorStore(
+        data_dir=str(tmp_path / "50"), dimension=DIM, index_factory="SQ4", rerank_candidates=50
+    )
+    reloaded.add("mem_new", random_vectors(1, seed=1)[0], {})
+    np.testing.assert_array_equal(reloaded.get_vector("mem_7"), vectors[7])
+    np.testing.assert_array_equal(reloaded.get_vector("mem_new"), random_vectors(1, seed=1)[0])
+    assert reloaded.search(vectors[123], top_k=1)[0]["score"] == 1.0
+
+    reloaded.rebuild("Flat")
+    assert not (tmp_path / "50" / "vectors.f32").exists()
+    np.testing.assert_array_equal(reloaded.get_vector("mem_7"), vectors[7])
+
+
+def test_evaluate_reports_recall(store):
+    """Test the recall/latency report on an exact index"""
+    store.add_batch([f"mem_{i}" for i in range(50)], random_vectors(50), [{}] * 50)
+
+    report = store.evaluate(k=5, n_queries=10)
+
+    assert report["vectors"] == 50
+    assert report["recall"] == 1.0
+    assert report["avg_query_ms"] >= 0
+
+
+def test_delete_removes_vector_from_index(store):
+    """Test deletes free the vector and no longer take top-k slots"""
+    vectors = random_vectors(5)
+    store.add_batch([f"mem_{i}" for i in range(5)], vectors, [{}] * 5)
+
+    store.delete("mem_2")
+    store.add("mem_3", vectors[3], {"replaced": True})
+
+    assert store.index.ntotal == 4
+    assert len(store.search(vectors[2], top_k=4)) == 4
+
+
+def test_hnsw_deletes_are_tombstoned_and_compacted(tmp_path):
+    """Test indexes without removal honour tombstones and compact past the threshold"""
+    store = VectorStore(
+        data_dir=str(tmp_path), dimension=DIM, index_factory="HNSW16,Flat", tombstone_ratio=0.2
+    )
+    vectors = random_vectors(20)
+    store.add_batch([f"mem_{i}" for i in range(20)], vectors, [{}] * 20)
+
+    for i in range(4):
+        store.delete(f"mem_{i}")
+    assert store.tombstones == {0, 1, 2, 3}
+    assert store.index.ntotal == 20
+    assert len(store.search(vectors[0], top_k=16)) == 16
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM, index_factory="HNSW16,Flat")
+    assert reloaded.tombstones == {0, 1, 2, 3}
+
+    store.delete("mem_4")
+    assert store.tombstones == set()
+    assert store.index.ntotal == 15
+
+
+def test_cosine_metric_scores_and_min_score(tmp_path):
+    """Test cosine stores return calibrated scores and honour min_score"""
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM, metric="cosine")
+    vectors = random_vectors(10)
+    store.add_batch([f"mem_{i}" for i in range(10)], vectors, [{}] * 10)
+
+    results = store.search(vectors[4] * 3, top_k=10)
+    assert results[0]["id"] == "mem_4"
+    assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+    cutoff = results[3]["score"]
+    assert len(store.search(vectors[4], top_k=10, min_score=cutoff)) == 4
+
+    store.checkpoint()
+    assert VectorStore(data_dir=str(tmp_path), dimension=DIM).metric == "cosine"
+
+
+def test_rebuild_switches_metric(store):
+    """Test an l2 store can be rebuilt as a cosine store"""
+    vectors = random_vectors(10)
+    store.add_batch([f"mem_{i}" for i in range(10)], vectors, [{}] * 10)
+
+    store.rebuild(metric="cosine")
+
+    assert store.index.metric_type == faiss.METRIC_INNER_PRODUCT
+    assert store.search(vectors[7], top_k=1)[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_unknown_metric_is_rejected(tmp_path):
+    """Test invalid metrics fail fast"""
+    with pytest.raises(ValueError):
+        VectorStore(data_dir=str(tmp_path), dimension=DIM, metric="manhattan")
+
+
+def test_migrates_json_metadata_with_pending_wal(tmp_path):
+    """Test a metadata.json snapshot plus unreplayed WAL moves into SQLite intact"""
+    vectors = random_vectors(3)
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(DIM))
+    index.add_with_ids(vectors[:2], np.arange(2, dtype="int64"))
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+    metadata = {f"mem_{i}": {"label": i, "metadata": {"n": i}} for i in range(2)}
+    (tmp_path / "metadata.json").write_text(json.dumps(metadata))
+    (tmp_path / "id_map.json").write_text(json.dumps({"next_label": 2, "lsn": 5, "labels": []}))
+    wal = [
+        {"op": "add", "id": "mem_2", "label": 2, "metadata": {"n": 2}, "lsn": 6},
+        {"op": "delete", "id": "mem_0", "lsn": 7},
+    ]
+    wal[0]["vector"] = base64.b64encode(vectors[2].tobytes()).decode()
+    (tmp_path / "wal.log").write_text("".join(json.dumps(r) + "\n" for r in wal))
+
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+
+    assert store.count() == 2
+    assert store.get("mem_0") is None
+    assert store.search(vectors[2], top_k=1)[0]["metadata"] == {"n": 2}
+    assert VectorStore(data_dir=str(tmp_path), dimension=DIM).count() == 2
+
+
+def test_replay_is_idempotent_after_metadata_commit(tmp_path):
+    """Test WAL replay over metadata that was already committed"""
+    vectors = random_vectors(3)
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+    store.add_batch(["mem_0", "mem_1"], vectors[:2], [{}, {}])
+    store.checkpoint()
+    store.add("mem_0", vectors[2], {"v": 2})
+    store.delete("mem_1")
+
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM)
+
+    assert reloaded.count() == 1
+    assert reloaded.index.ntotal == 1
+    assert reloaded.search(vectors[2], top_k=5)[0]["metadata"] == {"v": 2}
+
+
+def test_metadata_store_strips_legacy_embeddings(tmp_path):
+    """Test rows written with duplicated embeddings are migrated once"""
+    db = sqlite3.connect(str(tmp_path / "metadata.db"))
+    db.execute("CREATE TABLE memories (label INTEGER PRIMARY KEY, id TEXT UNIQUE, metadata TEXT)")
+    db.execute(
+        "INSERT INTO memories VALUES (0, 'mem_0', ?)",
+        (json.dumps({"content": "x", "embedding": [0.1] * DIM}),),
+    )
+    db.commit()
+    db.close()
+
+    store = MetadataStore(tmp_path / "metadata.db")
+
+    assert store.get("mem_0")["metadata"] == {"content": "x"}
+    assert [id for _, id, _, _ in store.search_text("x")] == ["mem_0"]
+
+
+def test_metadata_store_indexes_legacy_tags(tmp_path):
+    """Test rows written before the tag index are backfilled into it"""
+    db = sqlite3.connect(str(tmp_path / "metadata.db"))
+    db.execute("CREATE TABLE memories (label INTEGER PRIMARY KEY, id TEXT UNIQUE, metadata TEXT)")
+    rows = [
+        (0, "mem_0", {"tags": ["a", "b"], "timestamp": "2026-01-01T00:00:00"}),
+        (1, "mem_1", {"tags": ["a"], "timestamp": "2026-02-01T00:00:00"}),
+    ]
+    db.executemany(
+        "INSERT INTO memories VALUES (?, ?, ?)", [(*r[:2], json.dumps(r[2])) for r in rows]
+    )
+    db.execute("PRAGMA user_version = 1")
+    db.commit()
+    db.close()
+
+    store = MetadataStore(tmp_path / "metadata.db")
+
+    assert store.filter_labels(tags=["a"]).tolist() == [0, 1]
+    assert store.filter_labels(tags=["a", "b"]).tolist() == [0]
+    assert store.filter_labels(since="2026-01-15").tolist() == [1]
+    assert [id for id, _ in store.recent(tags=["a"])] == ["mem_1", "mem_0"]
+
+
+@pytest.mark.parametrize("index_factory", ["Flat", "IVF1,Flat", "HNSW16,Flat"])
+@pytest.mark.parametrize("exact_max", [0, 4096])
+def test_search_filters_by_tag_and_time(tmp_path, monkeypatch, exact_max, index_factory):
+    """Test filtered searches only return matching memories, via selector or exact scan"""
+    monkeypatch.setattr(vector_store, "EXACT_FILTER_MAX", exact_max)
+    store = VectorStore(
+        data_dir=str(tmp_path), dimension=DIM, index_factory=index_factory, index_train_size=40
+    )
+    vectors = random_vectors(40)
+    metadatas = [
+        {"tags": ["even"] if i % 2 == 0 else ["odd"], "timestamp": f"2026-01-{i % 28 + 1:02d}"}
+        for i in range(40)
+    ]
+    store.add_batch([f"mem_{i}" for i in range(40)], vectors, metadatas)
+    assert store.active_factory == index_factory
+
+    results = store.search(vectors[3], top_k=5, filters={"tags": ["even"]})
+    assert len(results) == 5
+    assert all("even" in r["metadata"]["tags"] for r in results)
+
+    results = store.search(vectors[3], top_k=5, filters={"tags": ["odd"], "until": "2026-01-05"})
+    assert [r["id"] for r in results][0] == "mem_3"
+    assert {r["id"] for r in results} == {"mem_1", "mem_3", "mem_29", "mem_31"}
+
+    assert store.search(vectors[3], top_k=5, filters={"tags": ["missing"]}) == []
+
+
+def test_retagging_replaces_tag_index(store):
+    """Test re-adding an ID drops the tags of its previous version"""
+    vectors = random_vectors(2)
+    store.add("mem_0", vectors[0], {"tags": ["old"]})
+    store.add("mem_0", vectors[1], {"tags": ["new"]})
+    store.add("mem_1", vectors[1], {"tags": ["old"]})
+    store.delete("mem_1")
+
+    assert store.search(vectors[0], filters={"tags": ["old"]}) == []
+    assert [r["id"] for r in store.search(vectors[0], filters={"tags": ["new"]})] == ["mem_0"]
+
+
+def test_search_text_ranks_by_bm25_and_follows_writes(store):
+    """Test full-text search matches identifiers and stays in sync with replaces and deletes"""
+    vectors = random_vectors(4)
+    contents = [
+        "Deploy failed on db-01.example.com with ERR_CONN_RESET",
+        "db-02.example.com is healthy",
+        "Lunch with the example team",
+        "Chunk text is searched through its parent",
+    ]
+    metadatas = [{"content": c, "tags": ["ops"] if i < 2 else []} for i, c in enumerate(contents)]
+    metadatas[3]["parent"] = "mem_0"
+    store.add_batch([f"mem_{i}" for i in range(4)], vectors, metadatas)
+
+    results = store.search_text("db-01.example.com")
+    assert results[0]["id"] == "mem_0"
+    assert results[0]["metadata"]["content"] == contents[0]
+    assert {r["id"] for r in store.search_text("ERR_CONN_RESET lunch")} == {"mem_0", "mem_2"}
+    results = store.search_text("example", filters={"tags": ["ops"]})
+    assert {r["id"] for r in results} == {"mem_0", "mem_1"}
+    assert store.search_text("parent") == []
+    assert store.search_text('"*" ()') == []
+
+    store.add("mem_0", vectors[0], {"content": "Deploy succeeded"})
+    store.delete("mem_1")
+    assert store.search_text("db-01.example.com healthy") == []
+    assert [r["id"] for r in store.search_text("deploy")] == ["mem_0"]
+
+
+@pytest.mark.parametrize("index_factory", ["Flat", "HNSW16,Flat"])
+def test_reembed_swaps_in_new_vectors(tmp_path, index_factory):
+    """Test reembed replaces every vector, even with a new dimension"""
+    store = VectorStore(data_dir=str(tmp_path), dimension=DIM, index_factory=index_factory)
+    ids = [f"mem_{i}" for i in range(30)]
+    store.add_batch(ids, random_vectors(30), [{"n": i} for i in range(30)])
+    store.delete("mem_7")
+    new_vectors = np.random.default_rng(1).random((30, 4), dtype=np.float32)
+
+    count = store.reembed(
+        lambda metadatas: new_vectors[[m["n"] for m in metadatas]], dimension=4, batch_size=8
+    )
+
+    assert count == 29
+    reloaded = VectorStore(data_dir=str(tmp_path), dimension=DIM, index_factory=index_factory)
+    assert reloaded.dimension == 4
+    assert reloaded.active_factory == index_factory
+    assert reloaded.search(new_vectors[12], top_k=1)[0]["id"] == "mem_12"
+    assert "mem_7" not in [r["id"] for r in reloaded.search(new_vectors[7], top_k=30)]